@@ -0,0 +1,23 @@
+"""
+Gunicorn settings for running Bitcoin Relay outside the development server.
+
+    pip install gunicorn
+    gunicorn wsgi:app -c gunicorn_conf.py
+
+The relay engine runs as a thread inside the app process, so there must be
+exactly one worker process: a second worker would start a second engine
+and both would try to relay the same hops. Concurrency comes from threads.
+Upstream API calls are blocking `requests` calls that release the GIL, so
+a thread per in-flight request is enough at this scale.
+"""
+import os
+
+bind = os.environ.get('BIND', '127.0.0.1:5000')
+
+workers = 1
+worker_class = 'gthread'
+# Each open dashboard holds one thread for /api/status/stream
+threads = int(os.environ.get('THREADS', (os.cpu_count() or 1) * 4 + 8))
+
+keepalive = 5
+graceful_timeout = 15
@@ -3,53 +3,220 @@ Bitcoin Relay - Personal Fund Privacy Tool
 Main Flask application with web interface and API.
 """
 import os
-import json
+import time
+import atexit
+import hashlib
+import multiprocessing
+import secrets
 import threading
-from datetime import datetime, timedelta
-from flask import Flask, render_template, request, jsonify, session
-from functools import wraps
-
-from .config import NETWORKS, MAX_HOPS, MIN_HOPS
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, Tuple, Optional
+from flask import Flask, Response, render_template, request, jsonify, g, stream_with_context
+from flask.json.provider import DefaultJSONProvider
+import orjson
+
+from .config import (
+    NETWORKS, MAX_HOPS, MIN_HOPS, CHAINS_ETAG_TTL, STATUS_STREAM_KEEPALIVE, LOG_PAGE_SIZE,
+    IO_POOL_WORKERS, CRYPTO_POOL_WORKERS, SECRET_KEY, SECRET_KEY_PATH
+)
 from .database import (
-    init_database, get_active_network, set_active_network, create_relay_chain,
-    get_relay_chain, get_all_relay_chains, update_chain_status,
-    create_relay_hop, get_relay_hops, get_transaction_log, log_transaction,
-    update_hop_status, update_hop_relayed, update_chain_amounts,
-    get_setting, set_setting
+    init_database, close_connections, get_active_network, set_active_network, create_relay_chain,
+    get_relay_chain, get_chain_counts, get_all_relay_chains_with_hops, update_chain_status,
+    create_relay_hops_bulk, get_relay_hops, get_transaction_log, log_transaction,
+    update_hops_status, update_chain_amounts, db_transaction
 )
 from .encryption import KeyEncryption
 from .bitcoin_utils import (
-    BitcoinAPI, WalletManager, calculate_fibonacci_delays,
-    estimate_total_fees, estimate_relay_timing
+    get_bitcoin_api, get_wallet_manager, calculate_fibonacci_delays,
+    estimate_total_fees, estimate_relay_timing, generate_encrypted_key_pair
 )
-from .relay_engine import RelayEngine, manual_relay_chain
+from .relay_engine import RelayEngine, manual_relay_chain, status_notifier
 
 
 # Default encryption key for local storage (user can change this)
 DEFAULT_KEY = "bitcoin-relay-local-key-2025"
 
+# Shared pool so a request can wait on several upstream API calls at once
+_io_pool = ThreadPoolExecutor(max_workers=IO_POOL_WORKERS, thread_name_prefix='api-io')
+
+# Worker processes for key generation + encryption when creating chains,
+# started on first use (see _get_crypto_pool)
+_crypto_pool: Optional[ProcessPoolExecutor] = None
+_crypto_pool_lock = threading.Lock()
+
+
+def _get_crypto_pool() -> ProcessPoolExecutor:
+    """
+    The key generation pool, created on first use. Workers are spawned, not forked:
+    a fork would copy a parent that already runs engine and I/O threads and holds
+    pooled SQLite connections.
+    """
+    global _crypto_pool
+    with _crypto_pool_lock:
+        if _crypto_pool is None:
+            _crypto_pool = ProcessPoolExecutor(
+                max_workers=CRYPTO_POOL_WORKERS, mp_context=multiprocessing.get_context('spawn')
+            )
+        return _crypto_pool
+
+
+def _shutdown_crypto_pool():
+    global _crypto_pool
+    with _crypto_pool_lock:
+        pool, _crypto_pool = _crypto_pool, None
+    if pool is not None:
+        pool.shutdown()
+
+
+def _active_network() -> str:
+    """Get the active network once per request; the settings read itself is cached."""
+    if 'active_network' not in g:
+        g.active_network = get_active_network()
+    return g.active_network
+
+
+def _tip_height_or_none(network: str) -> Optional[int]:
+    try:
+        return get_bitcoin_api(network).get_block_height()
+    except Exception:
+        return None
+
+
+def _state_etag(*parts: Any) -> str:
+    """
+    ETag over relay state that is already in memory: the status notifier
+    version (bumped on every chain or engine change) plus the given parts.
+    Callers pass the tip height from the TTL cache, so a matching poll is
+    answered without touching the database or fetching balances.
+    """
+    key = ':'.join(str(p) for p in (status_notifier.version,) + parts)
+    return hashlib.md5(key.encode()).hexdigest()
+
+
+def _not_modified(etag: str) -> Optional[Response]:
+    """Return a 304 response if the client already has this ETag."""
+    if etag in request.if_none_match:
+        return _with_etag(Response(status=304), etag)
+    return None
+
+
+def _with_etag(response: Response, etag: str) -> Response:
+    response.set_etag(etag)
+    # Let browsers keep the body but revalidate on every poll
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+class BodyError(ValueError):
+    """Raised when a JSON request body is missing or has a field of the wrong type."""
+    pass
+
+
+# Request body schemas: field -> (expected type, default when missing or null)
+NETWORK_BODY = {'network': (str, None)}
+FEE_ESTIMATE_BODY = {'num_hops': (int, 3), 'fee_priority': (str, 'medium')}
+CREATE_CHAIN_BODY = {
+    'name': (str, None),
+    'num_hops': (int, 3),
+    'final_address': (str, None),
+    'fee_priority': (str, 'medium'),
+    'dry_run': (bool, False),
+}
+ADDRESS_BODY = {'address': (str, None)}
+
+_TYPE_NAMES = {str: 'a string', int: 'an integer', bool: 'a boolean'}
+
+
+def _parse_body(schema: Dict[str, Tuple[type, Any]]) -> Dict[str, Any]:
+    """Decode the JSON body and type-check the fields named in schema in a single pass."""
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        raise BodyError('Request body must be a JSON object')
+    
+    body = {}
+    for field, (expected, default) in schema.items():
+        value = data.get(field)
+        if value is None:
+            body[field] = default
+            continue
+        # bool is a subclass of int; don't accept true/false as a number
+        if not isinstance(value, expected) or (expected is int and isinstance(value, bool)):
+            raise BodyError(f"'{field}' must be {_TYPE_NAMES[expected]}")
+        body[field] = value
+    return body
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """JSON provider backed by orjson, so jsonify() call sites stay unchanged."""
+    # Engine status uses int chain ids as dict keys
+    options = orjson.OPT_NON_STR_KEYS
+    
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default, option=self.options).decode('utf-8')
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+    
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            orjson.dumps(obj, default=self.default, option=self.options), mimetype=self.mimetype
+        )
+
+
+def _load_or_create_secret(path) -> bytes:
+    """Read the persisted secret key, creating it (owner-only) on first run."""
+    try:
+        return path.read_bytes()
+    except FileNotFoundError:
+        pass
+    key = secrets.token_bytes(32)
+    path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        # Another worker created it first
+        return path.read_bytes()
+    with os.fdopen(fd, 'wb') as f:
+        f.write(key)
+    return key
+
 
 def create_app():
     """Application factory."""
     app = Flask(__name__, template_folder='../templates', static_folder='../static')
-    app.secret_key = os.urandom(32)
-    app.permanent_session_lifetime = timedelta(hours=24)
+    app.json = OrjsonProvider(app)
+    app.secret_key = SECRET_KEY or _load_or_create_secret(SECRET_KEY_PATH)
     
     # Initialize database
     init_database()
+    atexit.register(close_connections)
+    atexit.register(_shutdown_crypto_pool)
     
     # Global relay engine state
     app.relay_engine = None
     app.engine_lock = threading.Lock()
+    # Set while the engine is running, so the per-request check needs no lock
+    app.engine_ready = threading.Event()
     app.encryption_key = DEFAULT_KEY
     
-    # Auto-start engine on app creation
+    # Start/stop transitions are serialized by engine_lock so two engines never
+    # run at once. Readers never take the lock: they load app.relay_engine once
+    # and use that reference, and a new engine is only published once started.
+    def _start_engine_locked(engine):
+        # Caller holds app.engine_lock
+        old = app.relay_engine
+        if old and old.is_running:
+            old.stop()
+        engine.start()
+        app.relay_engine = engine
+        app.engine_ready.set()
+    
     def start_engine_for_network(network):
+        engine = RelayEngine(network, app.encryption_key)
         with app.engine_lock:
-            if app.relay_engine and app.relay_engine.is_running:
-                app.relay_engine.stop()
-            app.relay_engine = RelayEngine(network, app.encryption_key)
-            app.relay_engine.start()
+            _start_engine_locked(engine)
 
     # ========================================================================
     # Web Interface Routes
@@ -58,6 +225,9 @@ def create_app():
     @app.route('/')
     def index():
         """Main dashboard page."""
+        # The page asks for status (tip height) and fees as soon as it loads;
+        # start both fetches now so they are served from cache
+        _io_pool.submit(get_bitcoin_api(_active_network()).get_tip_and_fees)
         return render_template('index.html')
 
     # ========================================================================
@@ -67,7 +237,7 @@ def create_app():
     @app.route('/api/network', methods=['GET'])
     def get_network():
         """Get current network setting."""
-        network = get_active_network()
+        network = _active_network()
         return jsonify({
             'network': network,
             'config': NETWORKS[network]
@@ -76,13 +246,13 @@ def create_app():
     @app.route('/api/network', methods=['POST'])
     def switch_network():
         """Switch between testnet and mainnet."""
-        data = request.json
-        network = data.get('network')
+        network = _parse_body(NETWORK_BODY)['network']
         
         if network not in ('testnet', 'mainnet'):
             return jsonify({'error': 'Invalid network'}), 400
         
         set_active_network(network)
+        g.active_network = network
         start_engine_for_network(network)
         
         return jsonify({
@@ -98,11 +268,10 @@ def create_app():
     @app.route('/api/fees', methods=['GET'])
     def get_fees():
         """Get current fee estimates."""
-        network = get_active_network()
-        api = BitcoinAPI(network)
+        network = _active_network()
         
         try:
-            fees = api.get_fee_estimates()
+            fees = get_bitcoin_api(network).get_fee_estimates()
             return jsonify({
                 'network': network,
                 'estimates': {
@@ -120,18 +289,17 @@ def create_app():
     @app.route('/api/fees/estimate', methods=['POST'])
     def estimate_fees_route():
         """Estimate total fees for a relay chain."""
-        data = request.json
-        num_hops = data.get('num_hops', 3)
-        fee_priority = data.get('fee_priority', 'medium')
+        body = _parse_body(FEE_ESTIMATE_BODY)
+        num_hops = body['num_hops']
+        fee_priority = body['fee_priority']
         
         if num_hops < MIN_HOPS or num_hops > MAX_HOPS:
             return jsonify({'error': f'Hops must be between {MIN_HOPS} and {MAX_HOPS}'}), 400
         
-        network = get_active_network()
-        api = BitcoinAPI(network)
+        network = _active_network()
         
         try:
-            fees = api.get_fee_estimates()
+            fees = get_bitcoin_api(network).get_fee_estimates()
             if fee_priority not in fees:
                 fee_priority = 'medium'
             
@@ -156,63 +324,91 @@ def create_app():
     @app.route('/api/chains', methods=['GET'])
     def list_chains():
         """List all relay chains with real-time balance info."""
-        network = request.args.get('network', get_active_network())
-        chains = get_all_relay_chains(network)
+        network = request.args.get('network') or _active_network()
         
-        api = BitcoinAPI(network)
+        # Taken before reading chains so a change mid-request yields a fresh tag next poll
+        etag = _state_etag(network, _tip_height_or_none(network), int(time.time() // CHAINS_ETAG_TTL))
+        not_modified = _not_modified(etag)
+        if not_modified:
+            return not_modified
         
-        for chain in chains:
-            chain['hops'] = get_relay_hops(chain['id'])
-            
-            if chain['status'] == 'active':
-                try:
-                    intake_bal = api.get_address_balance(chain['intake_address'])
-                    chain['intake_balance'] = {'confirmed': intake_bal[0], 'unconfirmed': intake_bal[1]}
-                    
-                    for hop in chain['hops']:
-                        hop_bal = api.get_address_balance(hop['address'])
-                        hop['live_balance'] = {'confirmed': hop_bal[0], 'unconfirmed': hop_bal[1]}
-                except:
-                    pass
+        chains = get_all_relay_chains_with_hops(network)
         
-        return jsonify({
-            'network': network,
-            'chains': chains
-        })
+        api = get_bitcoin_api(network)
+        
+        def chain_addresses(chain):
+            return [chain['intake_address']] + [hop['address'] for hop in chain['hops']]
+        
+        # Start balance lookups for every active chain up front
+        lookups = {
+            chain['id']: _io_pool.submit(api.get_address_balances, chain_addresses(chain))
+            for chain in chains if chain['status'] == 'active'
+        }
+        
+        def add_balances(chain):
+            try:
+                balances = lookups[chain['id']].result()
+            except Exception:
+                return
+            intake_bal = balances[0]
+            chain['intake_balance'] = {'confirmed': intake_bal[0], 'unconfirmed': intake_bal[1]}
+            for hop, hop_bal in zip(chain['hops'], balances[1:]):
+                hop['live_balance'] = {'confirmed': hop_bal[0], 'unconfirmed': hop_bal[1]}
+        
+        # Stream chains in list order, each one as soon as its balances are in,
+        # instead of building the whole response first. The 200 status and ETag
+        # go out before the body, so an error inside generate() can only cut the
+        # JSON short, not turn into an error status; add_balances keeps balance
+        # lookup failures from reaching it.
+        def generate():
+            yield '{"network":%s,"chains":[' % app.json.dumps(network)
+            for i, chain in enumerate(chains):
+                if chain['id'] in lookups:
+                    add_balances(chain)
+                yield (',' if i else '') + app.json.dumps(chain)
+            yield ']}'
+        
+        return _with_etag(Response(generate(), mimetype='application/json'), etag)
 
     @app.route('/api/chains', methods=['POST'])
     def create_chain_route():
         """Create a new relay chain."""
-        data = request.json
+        body = _parse_body(CREATE_CHAIN_BODY)
         
         password = app.encryption_key
         
-        name = data.get('name', f"Relay {datetime.now().strftime('%Y-%m-%d %H:%M')}")
-        num_hops = data.get('num_hops', 3)
-        final_address = data.get('final_address')
-        fee_priority = data.get('fee_priority', 'medium')
-        dry_run = data.get('dry_run', False)
+        name = body['name'] or f"Relay {datetime.now().strftime('%Y-%m-%d %H:%M')}"
+        num_hops = body['num_hops']
+        final_address = body['final_address']
+        fee_priority = body['fee_priority']
+        dry_run = body['dry_run']
         
         if num_hops < MIN_HOPS or num_hops > MAX_HOPS:
             return jsonify({'error': f'Hops must be between {MIN_HOPS} and {MAX_HOPS}'}), 400
         
-        network = get_active_network()
-        wallet = WalletManager(network)
+        network = _active_network()
+        wallet = get_wallet_manager(network)
         
         if final_address:
             if not wallet.validate_address(final_address):
                 return jsonify({'error': 'Invalid final address for this network'}), 400
         
         try:
-            intake_address, intake_privkey = wallet.generate_key_pair()
-            intake_privkey_enc = KeyEncryption.encrypt(intake_privkey, password)
+            generate_final = not final_address
+            num_keys = 1 + int(generate_final) + (0 if dry_run else num_hops)
+            
+            # Each key is PBKDF2-encrypted, which is CPU-bound; spread the work across processes
+            key_pairs = list(_get_crypto_pool().map(
+                generate_encrypted_key_pair, [network] * num_keys, [password] * num_keys
+            ))
+            
+            intake_address, intake_privkey_enc = key_pairs.pop(0)
             
             final_is_generated = False
             final_privkey_enc = None
             
-            if not final_address:
-                final_address, final_privkey = wallet.generate_key_pair()
-                final_privkey_enc = KeyEncryption.encrypt(final_privkey, password)
+            if generate_final:
+                final_address, final_privkey_enc = key_pairs.pop(0)
                 final_is_generated = True
             
             delays = calculate_fibonacci_delays(num_hops)
@@ -229,47 +425,44 @@ def create_app():
                     'delays': delays
                 })
             
-            chain_id = create_relay_chain(
-                name=name,
-                network=network,
-                intake_address=intake_address,
-                intake_privkey_encrypted=intake_privkey_enc,
-                final_address=final_address,
-                final_is_generated=final_is_generated,
-                final_privkey_encrypted=final_privkey_enc,
-                total_hops=num_hops
-            )
-            
+            hop_rows = []
             hop_addresses = []
-            for i in range(num_hops):
-                hop_address, hop_privkey = wallet.generate_key_pair()
-                hop_privkey_enc = KeyEncryption.encrypt(hop_privkey, password)
-                
-                create_relay_hop(
-                    chain_id=chain_id,
-                    hop_number=i,
-                    address=hop_address,
-                    privkey_encrypted=hop_privkey_enc,
-                    delay_blocks=delays[i]
-                )
-                
+            for i, (hop_address, hop_privkey_enc) in enumerate(key_pairs):
+                hop_rows.append((i, hop_address, hop_privkey_enc, delays[i]))
                 hop_addresses.append({
                     'hop_number': i,
                     'address': hop_address,
                     'delay_blocks': delays[i]
                 })
             
-            log_transaction(
-                chain_id=chain_id,
-                event_type='chain_created',
-                details=json.dumps({
-                    'num_hops': num_hops,
-                    'fee_priority': fee_priority
-                })
-            )
+            # Chain, hops and creation log entry are committed together
+            with db_transaction() as conn:
+                chain_id = create_relay_chain(
+                    name=name,
+                    network=network,
+                    intake_address=intake_address,
+                    intake_privkey_encrypted=intake_privkey_enc,
+                    final_address=final_address,
+                    final_is_generated=final_is_generated,
+                    final_privkey_encrypted=final_privkey_enc,
+                    total_hops=num_hops,
+                    conn=conn
+                )
+            
+                create_relay_hops_bulk(chain_id, hop_rows, conn=conn)
+            
+                log_transaction(
+                    chain_id=chain_id,
+                    event_type='chain_created',
+                    details={
+                        'num_hops': num_hops,
+                        'fee_priority': fee_priority
+                    },
+                    conn=conn
+                )
+            status_notifier.notify()
             
-            api = BitcoinAPI(network)
-            fees = api.get_fee_estimates()
+            fees = get_bitcoin_api(network).get_fee_estimates()
             fee_estimate = fees.get(fee_priority, fees['medium'])
             fee_breakdown = estimate_total_fees(num_hops, fee_estimate)
             timing = estimate_relay_timing(num_hops)
@@ -298,18 +491,27 @@ def create_app():
             return jsonify({'error': 'Chain not found'}), 404
         
         chain['hops'] = get_relay_hops(chain_id)
-        chain['log'] = get_transaction_log(chain_id)
+        # The log grows with every event, so it is only loaded on request, one page at a time
+        if request.args.get('include_log') == '1':
+            chain['log'] = get_transaction_log(
+                chain_id,
+                limit=max(0, request.args.get('log_limit', LOG_PAGE_SIZE, type=int)),
+                offset=max(0, request.args.get('log_offset', 0, type=int))
+            )
         
-        api = BitcoinAPI(chain['network'])
+        api = get_bitcoin_api(chain['network'])
+        addresses = [chain['intake_address']] + [hop['address'] for hop in chain['hops']] + [chain['final_address']]
         try:
-            intake_bal = api.get_address_balance(chain['intake_address'])
+            # One call for intake, hop and final balances; the lookups run concurrently
+            balances = api.get_address_balances(addresses)
+            
+            intake_bal = balances[0]
             chain['intake_balance'] = {'confirmed': intake_bal[0], 'unconfirmed': intake_bal[1]}
             
-            for hop in chain['hops']:
-                hop_bal = api.get_address_balance(hop['address'])
+            for hop, hop_bal in zip(chain['hops'], balances[1:-1]):
                 hop['live_balance'] = {'confirmed': hop_bal[0], 'unconfirmed': hop_bal[1]}
             
-            final_bal = api.get_address_balance(chain['final_address'])
+            final_bal = balances[-1]
             chain['final_balance'] = {'confirmed': final_bal[0], 'unconfirmed': final_bal[1]}
         except Exception as e:
             chain['balance_error'] = str(e)
@@ -326,8 +528,10 @@ def create_app():
         if chain['status'] not in ('pending', 'active'):
             return jsonify({'error': 'Can only cancel pending or active chains'}), 400
         
-        update_chain_status(chain_id, 'cancelled')
-        log_transaction(chain_id, 'chain_cancelled')
+        with db_transaction():
+            update_chain_status(chain_id, 'cancelled')
+            log_transaction(chain_id, 'chain_cancelled')
+        status_notifier.notify()
         
         return jsonify({'success': True})
 
@@ -341,8 +545,10 @@ def create_app():
         if chain['status'] != 'pending':
             return jsonify({'error': 'Can only activate pending chains'}), 400
         
-        update_chain_status(chain_id, 'active')
-        log_transaction(chain_id, 'chain_activated')
+        with db_transaction():
+            update_chain_status(chain_id, 'active')
+            log_transaction(chain_id, 'chain_activated')
+        status_notifier.notify()
         
         # Ensure relay engine is running
         start_engine_for_network(chain['network'])
@@ -353,6 +559,9 @@ def create_app():
     def retry_chain_route(chain_id):
         """Manually retry/recover a stuck chain."""
         result = manual_relay_chain(chain_id, app.encryption_key)
+        if 'error' not in result:
+            # Steps may have broadcast, logged or completed the chain
+            status_notifier.notify()
         return jsonify(result)
 
     @app.route('/api/chains/<int:chain_id>/fix-status', methods=['POST'])
@@ -363,35 +572,57 @@ def create_app():
             return jsonify({'error': 'Chain not found'}), 404
         
         hops = get_relay_hops(chain_id)
-        api = BitcoinAPI(chain['network'])
+        api = get_bitcoin_api(chain['network'])
         
         fixes = []
         
+        # Hop balances followed by the final address, fetched concurrently;
+        # balances[i + 1] is the next address in the chain after hop i
+        addresses = [hop['address'] for hop in hops] + [chain['final_address']]
+        balances = api.get_address_balances(addresses)
+        
+        # A hop that is empty while the next address holds funds has been relayed
+        relayed_ids = []
         for i, hop in enumerate(hops):
-            balance = api.get_address_balance(hop['address'])
-            
-            if balance[0] == 0 and balance[1] == 0 and hop['status'] != 'relayed':
-                if i < len(hops) - 1:
-                    next_bal = api.get_address_balance(hops[i+1]['address'])
-                else:
-                    next_bal = api.get_address_balance(chain['final_address'])
-                
-                if next_bal[0] > 0 or next_bal[1] > 0:
-                    update_hop_status(hop['id'], 'relayed')
-                    fixes.append(f"Fixed Hop {i+1}: {hop['status']} -> relayed")
-        
-        final_bal = api.get_address_balance(chain['final_address'])
-        if final_bal[0] > 0:
+            balance, next_bal = balances[i], balances[i + 1]
+            if (hop['status'] != 'relayed' and balance[0] == 0 and balance[1] == 0
+                    and (next_bal[0] > 0 or next_bal[1] > 0)):
+                relayed_ids.append(hop['id'])
+                fixes.append(f"Fixed Hop {i+1}: {hop['status']} -> relayed")
+        
+        final_bal = balances[-1]
+        completed = final_bal[0] > 0
+        
+        # Point current_hop at the furthest hop holding funds, so regular sweeps
+        # (which only check the hops from current_hop on) find them
+        funded = [i for i, bal in enumerate(balances[:-1]) if bal[0] > 0 or bal[1] > 0]
+        current_hop = chain['current_hop'] or 0
+        new_current_hop = funded[-1] if funded and not completed else current_hop
+        if new_current_hop != current_hop:
+            fixes.append(f"Fixed current hop: Hop {current_hop + 1} -> Hop {new_current_hop + 1}")
+        
+        if completed:
             if chain['status'] != 'completed':
-                update_chain_status(chain_id, 'completed')
-                update_chain_amounts(chain_id, amount_sent_sats=final_bal[0])
                 fixes.append(f"Fixed chain status: {chain['status']} -> completed")
             
+            # Funds at the final address mean every hop has been relayed
             for hop in hops:
                 if hop['status'] != 'relayed':
-                    update_hop_status(hop['id'], 'relayed')
+                    if hop['id'] not in relayed_ids:
+                        relayed_ids.append(hop['id'])
                     fixes.append(f"Fixed Hop: -> relayed")
         
+        if fixes:
+            # Apply all fixes in one transaction, hops in a single UPDATE
+            with db_transaction():
+                update_hops_status(relayed_ids, 'relayed')
+                if new_current_hop != current_hop:
+                    update_chain_amounts(chain_id, current_hop=new_current_hop)
+                if completed and chain['status'] != 'completed':
+                    update_chain_status(chain_id, 'completed')
+                    update_chain_amounts(chain_id, amount_sent_sats=final_bal[0])
+            status_notifier.notify()
+        
         return jsonify({'fixes': fixes, 'chain_id': chain_id})
 
     # ========================================================================
@@ -401,14 +632,13 @@ def create_app():
     @app.route('/api/address/validate', methods=['POST'])
     def validate_address_route():
         """Validate a Bitcoin address."""
-        data = request.json
-        address = data.get('address')
+        address = _parse_body(ADDRESS_BODY)['address']
         
         if not address:
             return jsonify({'error': 'Address required'}), 400
         
-        network = get_active_network()
-        wallet = WalletManager(network)
+        network = _active_network()
+        wallet = get_wallet_manager(network)
         
         return jsonify({
             'address': address,
@@ -419,14 +649,13 @@ def create_app():
     @app.route('/api/address/balance', methods=['POST'])
     def get_balance_route():
         """Get balance for an address."""
-        data = request.json
-        address = data.get('address')
+        address = _parse_body(ADDRESS_BODY)['address']
         
         if not address:
             return jsonify({'error': 'Address required'}), 400
         
-        network = get_active_network()
-        api = BitcoinAPI(network)
+        network = _active_network()
+        api = get_bitcoin_api(network)
         
         try:
             confirmed, unconfirmed = api.get_address_balance(address)
@@ -444,37 +673,63 @@ def create_app():
     # Status API
     # ========================================================================
 
-    @app.route('/api/status', methods=['GET'])
-    def get_status():
-        """Get current relay engine status."""
-        network = get_active_network()
-        api = BitcoinAPI(network)
+    def status_payload(network):
+        # Fetch the tip height while the chain counts are read from the database
+        height_future = _io_pool.submit(_tip_height_or_none, network)
         
-        try:
-            block_height = api.get_block_height()
-        except:
-            block_height = None
+        engine = app.relay_engine
+        engine_running = engine is not None and engine.is_running
+        engine_status = engine.get_status() if engine else {}
         
-        engine_running = app.relay_engine is not None and app.relay_engine.is_running
-        engine_status = app.relay_engine.get_status() if app.relay_engine else {}
+        counts = get_chain_counts(network)
         
-        chains = get_all_relay_chains(network)
-        active_chains = sum(1 for c in chains if c['status'] == 'active')
-        pending_chains = sum(1 for c in chains if c['status'] == 'pending')
+        block_height = height_future.result()
         
-        return jsonify({
+        return {
             'network': network,
             'block_height': block_height,
             'engine_running': engine_running,
             'engine_status': engine_status,
-            'active_chains': active_chains,
-            'pending_chains': pending_chains
-        })
+            'active_chains': counts.get('active', 0),
+            'pending_chains': counts.get('pending', 0)
+        }
+
+    @app.route('/api/status', methods=['GET'])
+    def get_status():
+        """Get current relay engine status."""
+        network = _active_network()
+        etag = _state_etag(network, _tip_height_or_none(network))
+        not_modified = _not_modified(etag)
+        if not_modified:
+            return not_modified
+        return _with_etag(jsonify(status_payload(network)), etag)
+
+    @app.route('/api/status/stream', methods=['GET'])
+    def status_stream():
+        """Push status to the dashboard as server-sent events whenever relay state changes."""
+        def events():
+            version = status_notifier.version
+            last_payload = None
+            while True:
+                g.pop('active_network', None)  # the network may be switched mid-stream
+                payload = app.json.dumps(status_payload(_active_network()))
+                if payload != last_payload:
+                    last_payload = payload
+                    yield f"data: {payload}\n\n"
+                else:
+                    yield ": keepalive\n\n"
+                version = status_notifier.wait(version, STATUS_STREAM_KEEPALIVE)
+        
+        return Response(
+            stream_with_context(events()),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
 
     @app.route('/api/engine/start', methods=['POST'])
     def start_engine():
         """Start the relay engine."""
-        network = get_active_network()
+        network = _active_network()
         start_engine_for_network(network)
         return jsonify({'success': True})
 
@@ -485,6 +740,7 @@ def create_app():
             if app.relay_engine is None or not app.relay_engine.is_running:
                 return jsonify({'error': 'Engine not running'}), 400
             app.relay_engine.stop()
+            app.engine_ready.clear()
         return jsonify({'success': True})
 
     # ========================================================================
@@ -501,45 +757,69 @@ def create_app():
         password = app.encryption_key
         
         try:
+            hops = get_relay_hops(chain_id)
+            export_final = bool(chain['final_is_generated'] and chain['final_privkey_encrypted'])
+            
+            encrypted = [chain['intake_privkey_encrypted']]
+            if export_final:
+                encrypted.append(chain['final_privkey_encrypted'])
+            encrypted.extend(hop['privkey_encrypted'] for hop in hops)
+            privkeys = KeyEncryption.decrypt_many(encrypted, password)
+            
             keys = {
                 'chain_id': chain_id,
                 'name': chain['name'],
                 'network': chain['network'],
                 'intake_address': chain['intake_address'],
-                'intake_privkey': KeyEncryption.decrypt(chain['intake_privkey_encrypted'], password),
+                'intake_privkey': privkeys[0],
                 'final_address': chain['final_address'],
             }
             
-            if chain['final_is_generated'] and chain['final_privkey_encrypted']:
-                keys['final_privkey'] = KeyEncryption.decrypt(chain['final_privkey_encrypted'], password)
+            if export_final:
+                keys['final_privkey'] = privkeys[1]
             
-            hops = get_relay_hops(chain_id)
-            keys['hops'] = []
-            for hop in hops:
-                keys['hops'].append({
+            hop_privkeys = privkeys[2 if export_final else 1:]
+            keys['hops'] = [
+                {
                     'hop_number': hop['hop_number'],
                     'address': hop['address'],
-                    'privkey': KeyEncryption.decrypt(hop['privkey_encrypted'], password)
-                })
+                    'privkey': privkey
+                }
+                for hop, privkey in zip(hops, hop_privkeys)
+            ]
             
             return jsonify(keys)
             
         except Exception as e:
             return jsonify({'error': f'Failed to export keys: {str(e)}'}), 500
 
+    @app.errorhandler(BodyError)
+    def handle_body_error(e):
+        return jsonify({'error': str(e)}), 400
+
     # Auto-start engine on first request
     @app.before_request
     def ensure_engine_running():
-        if app.relay_engine is None or not app.relay_engine.is_running:
-            network = get_active_network()
-            start_engine_for_network(network)
+        # Static assets never need the engine; skip the check for them
+        if request.endpoint == 'static' or app.engine_ready.is_set():
+            return
+        with app.engine_lock:
+            # Another request may have started it while we waited for the lock
+            if app.relay_engine is not None and app.relay_engine.is_running:
+                app.engine_ready.set()
+                return
+            _start_engine_locked(RelayEngine(_active_network(), app.encryption_key))
 
     return app
 
 
-# Create the application instance
-app = create_app()
+# Create the application instance, except in spawned crypto pool workers:
+# under `python -m src.app` they re-import this module as __mp_main__
+if __name__ != '__mp_main__':
+    app = create_app()
 
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    # Development server only; see gunicorn_conf.py for production.
+    # The debugger is opt-in since it allows code execution from the browser.
+    app.run(host='0.0.0.0', port=5000, debug=os.environ.get('FLASK_DEBUG') == '1', threaded=True)
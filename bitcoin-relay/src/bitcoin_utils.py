@@ -2,12 +2,24 @@
 Bitcoin utilities for wallet generation, transaction creation, and network interaction.
 Uses the 'bit' library for Bitcoin operations.
 """
+import re
+import time
+import threading
+import orjson
 import requests
-from typing import Optional, Tuple, List, Dict, Any
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional, Tuple, List, Dict, Any, Callable
 from dataclasses import dataclass
+from functools import lru_cache
 from enum import Enum
 
-from .config import NETWORKS, ESTIMATED_TX_VBYTES, FIBONACCI_DELAYS, MAX_HOPS
+from .config import (
+    NETWORKS, ESTIMATED_TX_VBYTES, FIBONACCI_DELAYS, MAX_HOPS, IO_POOL_WORKERS,
+    HTTP_POOL_CONNECTIONS, HTTP_POOL_MAXSIZE, FEE_CACHE_TTL, BLOCK_HEIGHT_CACHE_TTL, HTTP_RETRIES, HTTP_RETRY_BACKOFF, HTTP_RETRY_STATUSES
+)
+from .encryption import KeyEncryption
 
 
 class NetworkType(Enum):
@@ -15,7 +27,7 @@ class NetworkType(Enum):
     MAINNET = "mainnet"
 
 
-@dataclass
+@dataclass(frozen=True)
 class FeeEstimate:
     """Fee estimation result."""
     fee_rate_sat_vb: float
@@ -26,6 +38,7 @@ class FeeEstimate:
 @dataclass
 class UTXOInfo:
     """Unspent transaction output information."""
+    __slots__ = ("txid", "vout", "value_sats", "confirmations", "script_pubkey")
     txid: str
     vout: int
     value_sats: int
@@ -36,12 +49,28 @@ class UTXOInfo:
 @dataclass
 class TransactionInfo:
     """Transaction information."""
+    __slots__ = ("txid", "confirmed", "block_height", "fee_sats")
     txid: str
     confirmed: bool
     block_height: Optional[int]
     fee_sats: Optional[int]
 
 
+# Node rejections (RPC code -26) for a fee below the mempool or relay floor
+_FEE_FLOOR_BROADCAST_REASONS = ("mempool min fee not met", "min relay fee not met")
+
+# Node rejections meaning the transaction was already accepted, e.g. by an earlier
+# attempt whose response was lost
+_ALREADY_BROADCAST_REASONS = ("txn-already-known", "txn-already-in-mempool", "already in block chain")
+
+# Fee priority labels, fastest first
+FEE_PRIORITIES = ("high", "medium", "low", "economy")
+
+
+# Threads for fanning out per-address lookups (Esplora has no multi-address endpoint)
+_lookup_pool = ThreadPoolExecutor(max_workers=IO_POOL_WORKERS, thread_name_prefix='address-lookup')
+
+
 class BitcoinAPI:
     """Bitcoin network API interface using Blockstream/Mempool APIs."""
     
@@ -51,27 +80,92 @@ class BitcoinAPI:
         self.network = network
         self.config = NETWORKS[network]
         self.api_base = self.config["api_base"]
+        # Built once; endpoint URLs are a single concatenation per call
+        self._url_prefix = self.api_base + "/"
+        self._fees_url = (
+            "https://mempool.space/testnet/api/v1/fees/recommended" if network == "testnet"
+            else "https://mempool.space/api/v1/fees/recommended"
+        )
+        # Pooled session so keep-alive connections are reused across calls; sized
+        # so concurrent lookups from the thread pools don't discard connections
+        self.session = requests.Session()
+        self.session.headers.update({"Accept": "application/json", "User-Agent": "bitcoin-relay"})
+        # GETs are retried with backoff on transient statuses; broadcasts (POST) are not.
+        # The last response is returned as-is so raise_for_status() still raises HTTPError.
+        retry = Retry(
+            total=HTTP_RETRIES, backoff_factor=HTTP_RETRY_BACKOFF,
+            status_forcelist=HTTP_RETRY_STATUSES, raise_on_status=False
+        )
+        adapter = HTTPAdapter(
+            pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_MAXSIZE, max_retries=retry
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        # Short-lived results (tip height, fee estimates): key -> (expires_at, value)
+        self._cache: Dict[str, Tuple[float, Any]] = {}
+        self._inflight: Dict[str, Future] = {}
+        self._cache_lock = threading.Lock()
+    
+    def _cached(self, key: str, ttl: float, fetch: Callable[[], Any]) -> Any:
+        """
+        Return the cached result for key if younger than ttl seconds. Otherwise
+        fetch it once for all concurrent callers and cache it; failures are
+        raised to every waiting caller and not cached.
+        """
+        with self._cache_lock:
+            cached = self._cache.get(key)
+            if cached and time.monotonic() < cached[0]:
+                return cached[1]
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+        if not leader:
+            return future.result()
+        
+        try:
+            value = fetch()
+        except BaseException as e:
+            # Resolve waiters even on KeyboardInterrupt/SystemExit, or they would block forever
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(value)
+            with self._cache_lock:
+                self._cache[key] = (time.monotonic() + ttl, value)
+        finally:
+            with self._cache_lock:
+                del self._inflight[key]
+        return future.result()
     
     def _get(self, endpoint: str) -> Any:
-        url = f"{self.api_base}/{endpoint}"
-        response = requests.get(url, timeout=30)
+        url = self._url_prefix + endpoint
+        response = self.session.get(url, timeout=30)
         response.raise_for_status()
-        return response.json()
+        # Parse the raw bytes with orjson rather than decoding to text for the stdlib parser
+        return orjson.loads(response.content)
     
     def _get_text(self, endpoint: str) -> str:
-        url = f"{self.api_base}/{endpoint}"
-        response = requests.get(url, timeout=30)
+        url = self._url_prefix + endpoint
+        response = self.session.get(url, timeout=30)
         response.raise_for_status()
         return response.text
     
     def _post(self, endpoint: str, data: str) -> str:
-        url = f"{self.api_base}/{endpoint}"
-        response = requests.post(url, data=data, timeout=30)
+        url = self._url_prefix + endpoint
+        response = self.session.post(url, data=data, timeout=30)
         response.raise_for_status()
         return response.text
     
     def get_block_height(self) -> int:
-        return int(self._get_text("blocks/tip/height"))
+        """Current tip height, cached for BLOCK_HEIGHT_CACHE_TTL seconds."""
+        return self._cached("height", BLOCK_HEIGHT_CACHE_TTL, lambda: int(self._get_text("blocks/tip/height")))
+    
+    def get_tip_and_fees(self) -> Tuple[int, Dict[str, FeeEstimate]]:
+        """Tip height and fee estimates, fetched concurrently (different hosts) and cached as usual."""
+        height_future = _lookup_pool.submit(self.get_block_height)
+        fees = self.get_fee_estimates()
+        return height_future.result(), fees
     
     def get_block_hash(self, height: int) -> str:
         return self._get_text(f"block-height/{height}")
@@ -94,6 +188,50 @@ class BitcoinAPI:
         unconfirmed = mempool_stats.get("funded_txo_sum", 0) - mempool_stats.get("spent_txo_sum", 0)
         return confirmed, unconfirmed
     
+    @staticmethod
+    def _fetch_each(fetch, addresses: List[str]) -> Dict[str, Any]:
+        """Run fetch(address) concurrently for each distinct address, keyed by address."""
+        unique = list(dict.fromkeys(addresses))
+        return dict(zip(unique, _lookup_pool.map(fetch, unique)))
+    
+    def get_address_balances(self, addresses: List[str]) -> List[Tuple[int, int]]:
+        """Balances for several addresses, in order, fetched concurrently over the shared session."""
+        balances = self._fetch_each(self.get_address_balance, addresses)
+        return [balances[address] for address in addresses]
+    
+    def get_address_utxos_bulk(self, addresses: List[str]) -> Dict[str, List[UTXOInfo]]:
+        """UTXOs for several addresses, fetched concurrently."""
+        return self._fetch_each(self.get_address_utxos, addresses)
+    
+    def load_unspents(self, key) -> int:
+        """
+        Fill a bit key's unspents from this API, as key.get_unspents() would, and return its balance in sats.
+        Uses the shared session and cached tip instead of bit's own requests (a tip and UTXO fetch per address).
+        """
+        from bit.network.meta import Unspent
+        from bit.transaction import address_to_scriptpubkey
+        from bit.utils import bytes_to_hex
+        
+        typed_addresses = [(key.address, 'p2pkh' if key.is_compressed() else 'p2pkh-uncompressed')]
+        if key.segwit_address:
+            typed_addresses.append((key.segwit_address, 'np2wkh'))
+        tip = self.get_block_height()
+        utxos = self._fetch_each(lambda address: self._get(f"address/{address}/utxo"), [a for a, _ in typed_addresses])
+        
+        unspents = []
+        for address, unspent_type in typed_addresses:
+            script = bytes_to_hex(address_to_scriptpubkey(address))
+            unspents.extend(
+                Unspent(
+                    u["value"], tip - u["status"]["block_height"] + 1 if u["status"]["confirmed"] else 0,
+                    script, u["txid"], u["vout"]
+                ).set_type(unspent_type)
+                for u in utxos[address]
+            )
+        key.unspents[:] = unspents
+        key.balance = sum(unspent.amount for unspent in unspents)
+        return key.balance
+    
     def get_transaction(self, txid: str) -> Optional[TransactionInfo]:
         try:
             tx = self._get(f"tx/{txid}")
@@ -107,32 +245,79 @@ class BitcoinAPI:
                 return None
             raise
     
+    def get_transactions_bulk(self, txids: List[str]) -> Dict[str, Optional[TransactionInfo]]:
+        """Status of several transactions, fetched concurrently; None for txids the API doesn't know."""
+        return self._fetch_each(self.get_transaction, txids)
+    
     def get_address_transactions(self, address: str) -> List[Dict[str, Any]]:
         return self._get(f"address/{address}/txs")
     
+    def get_address_transactions_bulk(self, addresses: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+        """Recent transactions for several addresses, fetched concurrently."""
+        return self._fetch_each(self.get_address_transactions, addresses)
+    
     def broadcast_transaction(self, tx_hex: str) -> str:
         return self._post("tx", tx_hex)
     
+    @staticmethod
+    def is_retryable_broadcast_error(error: Exception) -> bool:
+        """
+        Whether a broadcast_transaction failure may succeed later with the same signed transaction:
+        network errors, rate limits and server errors. Anything else (fee floors, double spends,
+        invalid or missing inputs) needs the transaction rebuilt.
+        """
+        if isinstance(error, (requests.ConnectionError, requests.Timeout)):
+            return True
+        if isinstance(error, requests.HTTPError) and error.response is not None:
+            status = error.response.status_code
+            return status == 429 or status >= 500
+        return False
+    
+    @staticmethod
+    def is_fee_floor_error(error: Exception) -> bool:
+        """Whether a broadcast_transaction failure means the fee is below the node's floor."""
+        if isinstance(error, requests.HTTPError) and error.response is not None:
+            return any(reason in error.response.text for reason in _FEE_FLOOR_BROADCAST_REASONS)
+        return False
+    
+    @staticmethod
+    def is_already_broadcast_error(error: Exception) -> bool:
+        """Whether a broadcast_transaction failure means the node already has the transaction."""
+        if isinstance(error, requests.HTTPError) and error.response is not None:
+            return any(reason in error.response.text for reason in _ALREADY_BROADCAST_REASONS)
+        return False
+    
+    @staticmethod
+    def _fee_table(rates: Tuple[float, float, float, float]) -> Dict[str, FeeEstimate]:
+        """FeeEstimates for FEE_PRIORITIES from their sat/vB rates, in the same order."""
+        return {
+            priority: FeeEstimate(rate, int(rate * ESTIMATED_TX_VBYTES), priority)
+            for priority, rate in zip(FEE_PRIORITIES, rates)
+        }
+    
+    def _fetch_fee_estimates(self) -> Dict[str, FeeEstimate]:
+        response = self.session.get(self._fees_url, timeout=10)
+        response.raise_for_status()
+        data = orjson.loads(response.content)
+        return self._fee_table((data["fastestFee"], data["halfHourFee"], data["hourFee"], data["economyFee"]))
+    
     def get_fee_estimates(self) -> Dict[str, FeeEstimate]:
+        """Recommended fees, cached for FEE_CACHE_TTL seconds. Falls back to defaults (uncached) on error."""
         try:
-            url = "https://mempool.space/testnet/api/v1/fees/recommended" if self.network == "testnet" else "https://mempool.space/api/v1/fees/recommended"
-            response = requests.get(url, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-            return {
-                "high": FeeEstimate(data["fastestFee"], int(data["fastestFee"] * ESTIMATED_TX_VBYTES), "high"),
-                "medium": FeeEstimate(data["halfHourFee"], int(data["halfHourFee"] * ESTIMATED_TX_VBYTES), "medium"),
-                "low": FeeEstimate(data["hourFee"], int(data["hourFee"] * ESTIMATED_TX_VBYTES), "low"),
-                "economy": FeeEstimate(data["economyFee"], int(data["economyFee"] * ESTIMATED_TX_VBYTES), "economy")
-            }
+            return self._cached("fees", FEE_CACHE_TTL, self._fetch_fee_estimates)
         except Exception:
             default_rate = 10 if self.network == "testnet" else 20
-            return {
-                "high": FeeEstimate(default_rate * 2, int(default_rate * 2 * ESTIMATED_TX_VBYTES), "high"),
-                "medium": FeeEstimate(default_rate, int(default_rate * ESTIMATED_TX_VBYTES), "medium"),
-                "low": FeeEstimate(default_rate // 2, int(default_rate // 2 * ESTIMATED_TX_VBYTES), "low"),
-                "economy": FeeEstimate(default_rate // 4, int(default_rate // 4 * ESTIMATED_TX_VBYTES), "economy")
-            }
+            return self._fee_table((default_rate * 2, default_rate, default_rate // 2, default_rate // 4))
+
+
+# Address shape per network: Base58 (P2PKH/P2SH) is 26-35 chars, bech32 is 42-62
+_BASE58 = r'[1-9A-HJ-NP-Za-km-z]{25,34}'
+_BECH32 = r'[02-9ac-hj-np-z]{39,59}'
+ADDRESS_MIN_LENGTH, ADDRESS_MAX_LENGTH = 26, 62
+ADDRESS_PATTERNS = {
+    "mainnet": re.compile(rf'[13]{_BASE58}|bc1{_BECH32}'),
+    "testnet": re.compile(rf'[mn2]{_BASE58}|tb1{_BECH32}'),
+}
 
 
 class WalletManager:
@@ -141,21 +326,18 @@ class WalletManager:
     def __init__(self, network: str = "testnet"):
         self.network = network
         self.is_testnet = network == "testnet"
+        self._address_re = ADDRESS_PATTERNS["testnet" if self.is_testnet else "mainnet"]
+        from bit import PrivateKey, PrivateKeyTestnet
+        self._key_class = PrivateKeyTestnet if self.is_testnet else PrivateKey
     
     def generate_key_pair(self) -> Tuple[str, str]:
-        if self.is_testnet:
-            from bit import PrivateKeyTestnet as PrivateKey
-        else:
-            from bit import PrivateKey
-        key = PrivateKey()
+        key = self._key_class()
         return key.segwit_address, key.to_wif()
     
     def get_key_from_wif(self, wif: str):
-        if self.is_testnet:
-            from bit import PrivateKeyTestnet as PrivateKey
-        else:
-            from bit import PrivateKey
-        return PrivateKey(wif)
+        # A fresh key per call: bit keys carry mutable unspents/balance state,
+        # so they must not be shared between threads building transactions
+        return self._key_class(wif)
     
     def get_address_from_wif(self, wif: str) -> str:
         return self.get_key_from_wif(wif).segwit_address
@@ -178,23 +360,46 @@ class WalletManager:
         return tx, amount_sats
     
     def validate_address(self, address: str) -> bool:
-        valid_prefixes = ('m', 'n', '2', 'tb1') if self.is_testnet else ('1', '3', 'bc1')
-        if not address.startswith(valid_prefixes):
+        # No valid address is outside 26-62 chars; reject those without running the regex
+        if not ADDRESS_MIN_LENGTH <= len(address) <= ADDRESS_MAX_LENGTH:
             return False
-        if address.startswith(('bc1', 'tb1')):
-            return 42 <= len(address) <= 62
-        return 26 <= len(address) <= 35
+        return self._address_re.fullmatch(address) is not None
+
+
+@lru_cache(maxsize=None)
+def get_bitcoin_api(network: str) -> BitcoinAPI:
+    """Shared BitcoinAPI per network, so its HTTP session and connection pool are reused."""
+    return BitcoinAPI(network)
+
+
+@lru_cache(maxsize=None)
+def get_wallet_manager(network: str) -> WalletManager:
+    """Shared WalletManager per network."""
+    return WalletManager(network)
+
+
+def generate_encrypted_key_pair(network: str, password: str) -> Tuple[str, str]:
+    """
+    Generate a new key pair and return (address, encrypted_wif).
+    Module-level so it can be dispatched to a worker process.
+    """
+    address, wif = get_wallet_manager(network).generate_key_pair()
+    return address, KeyEncryption.encrypt(wif, password)
 
 
 def calculate_fibonacci_delays(num_hops: int) -> List[int]:
-    if num_hops > len(FIBONACCI_DELAYS):
-        fib = list(FIBONACCI_DELAYS)
-        while len(fib) < num_hops:
-            fib.append(fib[-1] + fib[-2])
-        return fib[:num_hops]
-    return FIBONACCI_DELAYS[:num_hops]
+    if num_hops <= len(FIBONACCI_DELAYS):
+        return list(FIBONACCI_DELAYS[:num_hops])
+    # Only reachable above MAX_HOPS
+    fib = list(FIBONACCI_DELAYS)
+    while len(fib) < num_hops:
+        fib.append(fib[-1] + fib[-2])
+    return fib
 
 
+# Inputs are a handful of hop counts and the current fee rates, so results are
+# memoized. Callers must treat the returned dicts as read-only.
+@lru_cache(maxsize=64)
 def estimate_total_fees(num_hops: int, fee_estimate: FeeEstimate) -> Dict[str, int]:
     num_transactions = num_hops + 1
     fee_per_tx = fee_estimate.estimated_fee_sats
@@ -207,6 +412,7 @@ def estimate_total_fees(num_hops: int, fee_estimate: FeeEstimate) -> Dict[str, i
     }
 
 
+@lru_cache(maxsize=32)
 def estimate_relay_timing(num_hops: int, avg_block_time_minutes: int = 10) -> Dict[str, Any]:
     delays = calculate_fibonacci_delays(num_hops)
     total_blocks = sum(delays)
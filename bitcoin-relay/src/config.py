@@ -7,6 +7,12 @@ from pathlib import Path
 BASE_DIR = Path(__file__).parent.parent
 DATABASE_PATH = BASE_DIR / "relay.db"
 
+# Idle SQLite connections kept open for reuse
+DB_POOL_SIZE = max(5, (os.cpu_count() or 1) * 2)
+
+# Prepared statements kept per connection (sqlite3's default is 128)
+DB_STATEMENT_CACHE_SIZE = 256
+
 # Encryption settings
 SALT_LENGTH = 16
 KEY_LENGTH = 32
@@ -30,8 +36,8 @@ NETWORKS = {
     }
 }
 
-# Fibonacci sequence for delays (in blocks)
-FIBONACCI_DELAYS = [1, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144]
+# Fibonacci sequence for delays (in blocks); covers MAX_HOPS so lookups are a slice
+FIBONACCI_DELAYS = (1, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144)
 
 # Safety limits
 MAX_HOPS = 10
@@ -43,6 +49,58 @@ ESTIMATED_TX_VBYTES = 110
 
 # Polling interval (seconds)
 BLOCK_POLL_INTERVAL = 30
+# With no active chains the engine polls less often, doubling the interval up
+# to this multiple of BLOCK_POLL_INTERVAL (activating a chain restarts it)
+ENGINE_IDLE_BACKOFF_MAX = 5
+
+# Blocks to wait before re-broadcasting a relay transaction after a transient
+# broadcast failure, by attempt
+BROADCAST_RETRY_DELAYS = FIBONACCI_DELAYS[:5]
+
+# Broadcasts of one signed transaction (the first plus a retry per delay above)
+# before it is dropped and rebuilt at the current fee estimate
+BROADCAST_MAX_ATTEMPTS = len(BROADCAST_RETRY_DELAYS) + 1
+
+# Cache lifetimes for upstream API data (seconds); shared by routes and the engine
+FEE_CACHE_TTL = 60
+BLOCK_HEIGHT_CACHE_TTL = 15
+
+# Max seconds a chain list ETag stays valid, so live balances (which change
+# without any relay state change, e.g. unconfirmed deposits) are re-fetched
+CHAINS_ETAG_TTL = 15
+
+# Max seconds between /api/status/stream events (keeps idle connections alive)
+STATUS_STREAM_KEEPALIVE = 15
+
+# Default page size for a chain's transaction log (GET /api/chains/<id>?include_log=1)
+LOG_PAGE_SIZE = 100
+
+# Worker threads for overlapping blocking upstream API calls
+IO_POOL_WORKERS = 16
+
+# Active chains the relay engine processes at once each cycle
+ENGINE_CHAIN_WORKERS = 8
+
+# Sweeps (about one per block) check only the hops a chain's current_hop says can
+# hold its funds; every this many sweeps, starting with the first, check them all
+ENGINE_FULL_SWEEP_INTERVAL = 12
+
+# urllib3 connection pool sizing for the shared upstream API session
+HTTP_POOL_CONNECTIONS = 32
+HTTP_POOL_MAXSIZE = 64
+
+# Retries for idempotent upstream requests on transient errors (rate limit, gateway)
+HTTP_RETRIES = 3
+HTTP_RETRY_BACKOFF = 0.2
+HTTP_RETRY_STATUSES = (429, 502, 503, 504)
+
+# Worker processes for CPU-bound key generation + encryption (PBKDF2 holds the GIL)
+CRYPTO_POOL_WORKERS = min(os.cpu_count() or 1, MAX_HOPS + 2)
+
+# Generated runtime secrets live here, outside the source tree
+DATA_DIR = Path(os.environ.get('BITCOIN_RELAY_DATA_DIR') or Path.home() / ".bitcoin-relay")
 
-# Flask settings
-SECRET_KEY = os.environ.get('SECRET_KEY') or os.urandom(32)
+# Flask settings. Without an env override the key is generated once and kept
+# in SECRET_KEY_PATH, so it survives restarts and is shared by all workers.
+SECRET_KEY = os.environ.get('BITCOIN_RELAY_SECRET') or os.environ.get('SECRET_KEY')
+SECRET_KEY_PATH = DATA_DIR / "secret_key"
@@ -2,22 +2,76 @@
 Database module for persistent storage of relay chains and keys.
 Uses SQLite for reliable, file-based storage.
 """
+import queue
 import sqlite3
-from typing import Optional, List, Dict, Any
+import threading
+from typing import Optional, List, Dict, Any, Tuple, Union, Callable
 from contextlib import contextmanager
+from functools import lru_cache
 from pathlib import Path
 
-from .config import DATABASE_PATH
+import orjson
+
+from .config import DATABASE_PATH, DB_POOL_SIZE, DB_STATEMENT_CACHE_SIZE
 
 
 def get_db_path() -> Path:
     return DATABASE_PATH
 
 
-@contextmanager
-def get_connection():
-    conn = sqlite3.connect(get_db_path())
+# Applied to every new connection. WAL lets the engine thread write while
+# API requests read; journal_mode itself is persisted by init_database.
+CONNECTION_PRAGMAS = (
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA cache_size=-20000",
+    "PRAGMA busy_timeout=5000",
+)
+
+_pool: "queue.LifoQueue[Tuple[Path, sqlite3.Connection]]" = queue.LifoQueue(maxsize=DB_POOL_SIZE)
+_local = threading.local()
+
+
+def _acquire() -> sqlite3.Connection:
+    path = get_db_path()
+    while True:
+        try:
+            conn_path, conn = _pool.get_nowait()
+        except queue.Empty:
+            break
+        if conn_path == path:
+            return conn
+        conn.close()
+    conn = sqlite3.connect(path, check_same_thread=False, cached_statements=DB_STATEMENT_CACHE_SIZE)
     conn.row_factory = sqlite3.Row
+    for pragma in CONNECTION_PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+def _release(conn: sqlite3.Connection):
+    try:
+        _pool.put_nowait((get_db_path(), conn))
+    except queue.Full:
+        conn.close()
+
+
+@contextmanager
+def get_connection(conn: Optional[sqlite3.Connection] = None):
+    if conn is not None:
+        # Part of a caller's db_transaction(), which commits or rolls back
+        yield conn
+        return
+    
+    # Nested calls on the same thread share the outer connection and transaction
+    outer = getattr(_local, 'conn', None)
+    if outer is not None:
+        yield outer
+        return
+    
+    conn = _local.conn = _acquire()
+    _local.after_commit = callbacks = []
     try:
         yield conn
         conn.commit()
@@ -25,115 +79,219 @@ def get_connection():
         conn.rollback()
         raise
     finally:
-        conn.close()
+        _local.conn = None
+        _local.after_commit = None
+        _release(conn)
+    for callback in callbacks:
+        callback()
+
+
+def _after_commit(callback: Callable[[], None]):
+    """
+    Run callback once the current thread's outermost transaction has committed;
+    it is dropped if that transaction rolls back. Call inside get_connection().
+    """
+    _local.after_commit.append(callback)
+
+
+@contextmanager
+def db_transaction():
+    """Yield one connection for several writes, committed together at exit."""
+    with get_connection() as conn:
+        yield conn
+
+
+# Whole schema, applied in one transaction by init_database
+SCHEMA_SQL = """
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS settings (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS relay_chains (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    network TEXT NOT NULL CHECK (network IN ('testnet', 'mainnet')),
+    status TEXT NOT NULL DEFAULT 'pending' 
+        CHECK (status IN ('pending', 'active', 'completed', 'failed', 'cancelled')),
+    intake_address TEXT NOT NULL,
+    intake_privkey_encrypted TEXT NOT NULL,
+    final_address TEXT NOT NULL,
+    final_is_generated INTEGER NOT NULL DEFAULT 0,
+    final_privkey_encrypted TEXT,
+    total_hops INTEGER NOT NULL,
+    current_hop INTEGER NOT NULL DEFAULT 0,
+    amount_received_sats INTEGER,
+    amount_sent_sats INTEGER,
+    total_fees_sats INTEGER DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    started_at TIMESTAMP,
+    completed_at TIMESTAMP,
+    error_message TEXT
+);
+
+CREATE TABLE IF NOT EXISTS relay_hops (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    chain_id INTEGER NOT NULL REFERENCES relay_chains(id) ON DELETE CASCADE,
+    hop_number INTEGER NOT NULL,
+    address TEXT NOT NULL,
+    privkey_encrypted TEXT NOT NULL,
+    delay_blocks INTEGER NOT NULL,
+    status TEXT NOT NULL DEFAULT 'waiting'
+        CHECK (status IN ('waiting', 'funded', 'pending_relay', 'relayed', 'failed')),
+    incoming_txid TEXT,
+    incoming_amount_sats INTEGER,
+    incoming_confirmed_at_block INTEGER,
+    outgoing_txid TEXT,
+    outgoing_amount_sats INTEGER,
+    outgoing_fee_sats INTEGER,
+    relay_at_block INTEGER,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    funded_at TIMESTAMP,
+    relayed_at TIMESTAMP,
+    UNIQUE(chain_id, hop_number)
+);
+
+CREATE TABLE IF NOT EXISTS transaction_log (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    chain_id INTEGER NOT NULL REFERENCES relay_chains(id) ON DELETE CASCADE,
+    hop_id INTEGER REFERENCES relay_hops(id) ON DELETE CASCADE,
+    event_type TEXT NOT NULL,
+    txid TEXT,
+    amount_sats INTEGER,
+    fee_sats INTEGER,
+    block_height INTEGER,
+    details TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- A signed relay transaction whose broadcast failed transiently; retried as-is
+-- from next_attempt_block on. At most one per chain (funds sit in one place).
+CREATE TABLE IF NOT EXISTS pending_broadcasts (
+    chain_id INTEGER PRIMARY KEY REFERENCES relay_chains(id) ON DELETE CASCADE,
+    source_index INTEGER NOT NULL,
+    tx_hex TEXT NOT NULL,
+    amount_sats INTEGER NOT NULL,
+    fee_sats INTEGER NOT NULL,
+    balance_sats INTEGER NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    first_seen_block INTEGER NOT NULL,
+    next_attempt_block INTEGER NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS block_tracker (
+    network TEXT PRIMARY KEY,
+    last_height INTEGER NOT NULL,
+    last_hash TEXT,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Per-network chain listing (newest first), and active chains / status counts
+CREATE INDEX IF NOT EXISTS idx_chains_network_created ON relay_chains(network, created_at);
+CREATE INDEX IF NOT EXISTS idx_chains_network_status_created ON relay_chains(network, status, created_at);
+-- Superseded by the two above; every chain query filters on network first
+DROP INDEX IF EXISTS idx_chains_status;
+DROP INDEX IF EXISTS idx_chains_network;
+DROP INDEX IF EXISTS idx_chains_network_status;
+-- Hops are always read by chain_id, which UNIQUE(chain_id, hop_number) already
+-- indexes in hop order; no query filters hops by status
+DROP INDEX IF EXISTS idx_hops_chain;
+DROP INDEX IF EXISTS idx_hops_status;
+-- A chain's log in time order; rowid (id) breaks ties straight from the index
+CREATE INDEX IF NOT EXISTS idx_log_chain_created ON transaction_log(chain_id, created_at);
+DROP INDEX IF EXISTS idx_log_chain;
+
+COMMIT;
+"""
 
 
 def init_database():
     with get_connection() as conn:
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS settings (
-                key TEXT PRIMARY KEY,
-                value TEXT NOT NULL,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS relay_chains (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                network TEXT NOT NULL CHECK (network IN ('testnet', 'mainnet')),
-                status TEXT NOT NULL DEFAULT 'pending' 
-                    CHECK (status IN ('pending', 'active', 'completed', 'failed', 'cancelled')),
-                intake_address TEXT NOT NULL,
-                intake_privkey_encrypted TEXT NOT NULL,
-                final_address TEXT NOT NULL,
-                final_is_generated INTEGER NOT NULL DEFAULT 0,
-                final_privkey_encrypted TEXT,
-                total_hops INTEGER NOT NULL,
-                current_hop INTEGER NOT NULL DEFAULT 0,
-                amount_received_sats INTEGER,
-                amount_sent_sats INTEGER,
-                total_fees_sats INTEGER DEFAULT 0,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                started_at TIMESTAMP,
-                completed_at TIMESTAMP,
-                error_message TEXT
-            )
-        """)
-        
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS relay_hops (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                chain_id INTEGER NOT NULL REFERENCES relay_chains(id) ON DELETE CASCADE,
-                hop_number INTEGER NOT NULL,
-                address TEXT NOT NULL,
-                privkey_encrypted TEXT NOT NULL,
-                delay_blocks INTEGER NOT NULL,
-                status TEXT NOT NULL DEFAULT 'waiting'
-                    CHECK (status IN ('waiting', 'funded', 'pending_relay', 'relayed', 'failed')),
-                incoming_txid TEXT,
-                incoming_amount_sats INTEGER,
-                incoming_confirmed_at_block INTEGER,
-                outgoing_txid TEXT,
-                outgoing_amount_sats INTEGER,
-                outgoing_fee_sats INTEGER,
-                relay_at_block INTEGER,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                funded_at TIMESTAMP,
-                relayed_at TIMESTAMP,
-                UNIQUE(chain_id, hop_number)
-            )
-        """)
-        
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS transaction_log (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                chain_id INTEGER NOT NULL REFERENCES relay_chains(id) ON DELETE CASCADE,
-                hop_id INTEGER REFERENCES relay_hops(id) ON DELETE CASCADE,
-                event_type TEXT NOT NULL,
-                txid TEXT,
-                amount_sats INTEGER,
-                fee_sats INTEGER,
-                block_height INTEGER,
-                details TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS block_tracker (
-                network TEXT PRIMARY KEY,
-                last_height INTEGER NOT NULL,
-                last_hash TEXT,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_chains_status ON relay_chains(status)")
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_chains_network ON relay_chains(network)")
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_hops_chain ON relay_hops(chain_id)")
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_hops_status ON relay_hops(status)")
+        # Persistent: the -wal and -shm files live next to DATABASE_PATH from now on.
+        # Must run outside a transaction, so before the schema script.
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA_SQL)
+        # Refreshes planner stats only for tables that changed enough to need it,
+        # e.g. if the last run was killed before close_connections
+        conn.execute("PRAGMA optimize")
+
+
+def close_connections():
+    """Close pooled connections, letting SQLite refresh planner stats first. Run at exit."""
+    optimized = False
+    while True:
+        try:
+            conn_path, conn = _pool.get_nowait()
+        except queue.Empty:
+            break
+        try:
+            if not optimized and conn_path == get_db_path():
+                conn.execute("PRAGMA optimize")
+                optimized = True
+        except sqlite3.Error:
+            pass
+        finally:
+            conn.close()
 
 
 # Settings Operations
+# Upserts run on every settings write and engine poll; kept as constants so
+# each call hits the connection's statement cache
+SET_SETTING_SQL = """
+    INSERT INTO settings (key, value, updated_at) VALUES (?, ?, CURRENT_TIMESTAMP)
+    ON CONFLICT(key) DO UPDATE SET value = excluded.value, updated_at = CURRENT_TIMESTAMP
+"""
+UPDATE_BLOCK_HEIGHT_SQL = """
+    INSERT INTO block_tracker (network, last_height, last_hash, updated_at) VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+    ON CONFLICT(network) DO UPDATE SET
+        last_height = excluded.last_height, last_hash = excluded.last_hash, updated_at = CURRENT_TIMESTAMP
+"""
+
+
+# Settings change rarely but are read on most requests; values read or written
+# through this module are kept here. Missing keys are cached as None. Writes
+# reach the cache only once committed (reentrant: see set_setting).
+_SETTINGS_CACHE: Dict[str, Optional[str]] = {}
+_settings_lock = threading.RLock()
+
+
 def get_setting(key: str) -> Optional[str]:
+    with _settings_lock:
+        if key in _SETTINGS_CACHE:
+            return _SETTINGS_CACHE[key]
     with get_connection() as conn:
         cursor = conn.cursor()
         cursor.execute("SELECT value FROM settings WHERE key = ?", (key,))
         row = cursor.fetchone()
-        return row['value'] if row else None
+        value = row['value'] if row else None
+    with _settings_lock:
+        _SETTINGS_CACHE.setdefault(key, value)
+        return _SETTINGS_CACHE[key]
+
+
+def _cache_setting(key: str, value: str):
+    with _settings_lock:
+        _SETTINGS_CACHE[key] = value
 
 
 def set_setting(key: str, value: str):
-    with get_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute("""
-            INSERT INTO settings (key, value, updated_at) VALUES (?, ?, CURRENT_TIMESTAMP)
-            ON CONFLICT(key) DO UPDATE SET value = ?, updated_at = CURRENT_TIMESTAMP
-        """, (key, value, value))
+    # Outside a db_transaction() the commit, and so the cache update, happens
+    # before the lock is released
+    with _settings_lock:
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(SET_SETTING_SQL, (key, value))
+            _after_commit(lambda: _cache_setting(key, value))
+
+
+def invalidate_settings_cache():
+    """Forget cached settings, e.g. after the settings table was changed directly."""
+    with _settings_lock:
+        _SETTINGS_CACHE.clear()
 
 
 def get_master_password_hash() -> Optional[str]:
@@ -157,8 +315,8 @@ def set_active_network(network: str):
 # Relay Chain Operations
 def create_relay_chain(name: str, network: str, intake_address: str, intake_privkey_encrypted: str,
                        final_address: str, final_is_generated: bool, final_privkey_encrypted: Optional[str],
-                       total_hops: int) -> int:
-    with get_connection() as conn:
+                       total_hops: int, conn: Optional[sqlite3.Connection] = None) -> int:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         cursor.execute("""
             INSERT INTO relay_chains (name, network, intake_address, intake_privkey_encrypted,
@@ -187,48 +345,122 @@ def get_all_relay_chains(network: Optional[str] = None) -> List[Dict[str, Any]]:
         return [dict(row) for row in cursor.fetchall()]
 
 
+def get_active_chains(network: str) -> List[Dict[str, Any]]:
+    """Active chains for a network, newest first."""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT * FROM relay_chains WHERE network = ? AND status = 'active' ORDER BY created_at DESC", (network,)
+        )
+        return [dict(row) for row in cursor.fetchall()]
+
+
+# Columns returned by chain listings: everything except the encrypted private
+# keys, which listings never use and which are the widest values in each row
+CHAIN_LIST_COLUMNS = (
+    "id, name, network, status, intake_address, final_address, final_is_generated, total_hops, "
+    "current_hop, amount_received_sats, amount_sent_sats, total_fees_sats, created_at, started_at, "
+    "completed_at, error_message"
+)
+HOP_LIST_COLUMNS = (
+    "id, chain_id, hop_number, address, delay_blocks, status, incoming_txid, incoming_amount_sats, "
+    "incoming_confirmed_at_block, outgoing_txid, outgoing_amount_sats, outgoing_fee_sats, relay_at_block, "
+    "created_at, funded_at, relayed_at"
+)
+
+
+def get_all_relay_chains_with_hops(network: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Chains (newest first) with their hops attached under 'hops', for listings.
+    Rows carry CHAIN_LIST_COLUMNS / HOP_LIST_COLUMNS, so no encrypted keys.
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        if network:
+            cursor.execute(
+                f"SELECT {CHAIN_LIST_COLUMNS} FROM relay_chains WHERE network = ? ORDER BY created_at DESC", (network,)
+            )
+        else:
+            cursor.execute(f"SELECT {CHAIN_LIST_COLUMNS} FROM relay_chains ORDER BY created_at DESC")
+        chains = [dict(row) for row in cursor.fetchall()]
+        
+        hops_by_chain = {}
+        for chain in chains:
+            chain['hops'] = hops_by_chain[chain['id']] = []
+        
+        # One query for every hop of the listed chains instead of one per chain
+        hop_columns = ", ".join(f"h.{col.strip()}" for col in HOP_LIST_COLUMNS.split(","))
+        if network:
+            cursor.execute(f"""
+                SELECT {hop_columns} FROM relay_hops h JOIN relay_chains c ON c.id = h.chain_id
+                WHERE c.network = ? ORDER BY h.chain_id, h.hop_number ASC
+            """, (network,))
+        else:
+            cursor.execute(f"SELECT {HOP_LIST_COLUMNS} FROM relay_hops ORDER BY chain_id, hop_number ASC")
+        for row in cursor.fetchall():
+            hops = hops_by_chain.get(row['chain_id'])
+            if hops is not None:
+                hops.append(dict(row))
+        return chains
+
+
+def get_chain_counts(network: str) -> Dict[str, int]:
+    """Number of chains per status on a network."""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT status, COUNT(*) AS n FROM relay_chains WHERE network = ? GROUP BY status", (network,))
+        return {row['status']: row['n'] for row in cursor.fetchall()}
+
+
+@lru_cache(maxsize=None)
+def _update_chain_sql(assignments: Tuple[str, ...]) -> str:
+    """UPDATE statement for one chain row with the given SET assignments; one string per combination."""
+    return f"UPDATE relay_chains SET {', '.join(assignments)} WHERE id = ?"
+
+
+# Timestamp column set when a chain enters each status
+_STATUS_TIMESTAMPS = {
+    'active': "started_at = CURRENT_TIMESTAMP",
+    'completed': "completed_at = CURRENT_TIMESTAMP",
+    'failed': "completed_at = CURRENT_TIMESTAMP",
+    'cancelled': "completed_at = CURRENT_TIMESTAMP",
+}
+
+_CHAIN_AMOUNT_COLUMNS = ('amount_received_sats', 'amount_sent_sats', 'total_fees_sats', 'current_hop')
+
+
 def update_chain_status(chain_id: int, status: str, error_message: Optional[str] = None):
     with get_connection() as conn:
         cursor = conn.cursor()
         updates = ["status = ?"]
         params = [status]
-        if status == 'active':
-            updates.append("started_at = CURRENT_TIMESTAMP")
-        elif status in ('completed', 'failed', 'cancelled'):
-            updates.append("completed_at = CURRENT_TIMESTAMP")
+        if status in _STATUS_TIMESTAMPS:
+            updates.append(_STATUS_TIMESTAMPS[status])
         if error_message:
             updates.append("error_message = ?")
             params.append(error_message)
         params.append(chain_id)
-        cursor.execute(f"UPDATE relay_chains SET {', '.join(updates)} WHERE id = ?", params)
+        cursor.execute(_update_chain_sql(tuple(updates)), params)
 
 
 def update_chain_amounts(chain_id: int, amount_received_sats: Optional[int] = None,
                          amount_sent_sats: Optional[int] = None, total_fees_sats: Optional[int] = None,
                          current_hop: Optional[int] = None):
+    values = (amount_received_sats, amount_sent_sats, total_fees_sats, current_hop)
+    updates = tuple(f"{col} = ?" for col, value in zip(_CHAIN_AMOUNT_COLUMNS, values) if value is not None)
+    if not updates:
+        return
+    params = [value for value in values if value is not None]
+    params.append(chain_id)
     with get_connection() as conn:
         cursor = conn.cursor()
-        updates, params = [], []
-        if amount_received_sats is not None:
-            updates.append("amount_received_sats = ?")
-            params.append(amount_received_sats)
-        if amount_sent_sats is not None:
-            updates.append("amount_sent_sats = ?")
-            params.append(amount_sent_sats)
-        if total_fees_sats is not None:
-            updates.append("total_fees_sats = ?")
-            params.append(total_fees_sats)
-        if current_hop is not None:
-            updates.append("current_hop = ?")
-            params.append(current_hop)
-        if updates:
-            params.append(chain_id)
-            cursor.execute(f"UPDATE relay_chains SET {', '.join(updates)} WHERE id = ?", params)
+        cursor.execute(_update_chain_sql(updates), params)
 
 
 # Relay Hop Operations
-def create_relay_hop(chain_id: int, hop_number: int, address: str, privkey_encrypted: str, delay_blocks: int) -> int:
-    with get_connection() as conn:
+def create_relay_hop(chain_id: int, hop_number: int, address: str, privkey_encrypted: str, delay_blocks: int,
+                     conn: Optional[sqlite3.Connection] = None) -> int:
+    with get_connection(conn) as conn:
         cursor = conn.cursor()
         cursor.execute("""
             INSERT INTO relay_hops (chain_id, hop_number, address, privkey_encrypted, delay_blocks)
@@ -237,6 +469,17 @@ def create_relay_hop(chain_id: int, hop_number: int, address: str, privkey_encry
         return cursor.lastrowid
 
 
+def create_relay_hops_bulk(chain_id: int, hops: List[Tuple[int, str, str, int]],
+                           conn: Optional[sqlite3.Connection] = None):
+    """Insert all hops of a chain in one transaction. Each hop is (hop_number, address, privkey_encrypted, delay_blocks)."""
+    with get_connection(conn) as conn:
+        cursor = conn.cursor()
+        cursor.executemany("""
+            INSERT INTO relay_hops (chain_id, hop_number, address, privkey_encrypted, delay_blocks)
+            VALUES (?, ?, ?, ?, ?)
+        """, [(chain_id, *hop) for hop in hops])
+
+
 def get_relay_hops(chain_id: int) -> List[Dict[str, Any]]:
     with get_connection() as conn:
         cursor = conn.cursor()
@@ -244,6 +487,22 @@ def get_relay_hops(chain_id: int) -> List[Dict[str, Any]]:
         return [dict(row) for row in cursor.fetchall()]
 
 
+def get_relay_hops_for_chains(chain_ids: List[int]) -> Dict[int, List[Dict[str, Any]]]:
+    """Hops for several chains in one query, grouped by chain id and ordered by hop number."""
+    hops_by_chain: Dict[int, List[Dict[str, Any]]] = {chain_id: [] for chain_id in chain_ids}
+    if not chain_ids:
+        return hops_by_chain
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        placeholders = ",".join("?" * len(chain_ids))
+        cursor.execute(f"""
+            SELECT * FROM relay_hops WHERE chain_id IN ({placeholders}) ORDER BY chain_id, hop_number ASC
+        """, list(chain_ids))
+        for row in cursor.fetchall():
+            hops_by_chain[row['chain_id']].append(dict(row))
+    return hops_by_chain
+
+
 def update_hop_funded(hop_id: int, incoming_txid: str, incoming_amount_sats: int,
                       confirmed_at_block: int, relay_at_block: int):
     with get_connection() as conn:
@@ -271,39 +530,154 @@ def update_hop_status(hop_id: int, status: str):
         cursor.execute("UPDATE relay_hops SET status = ? WHERE id = ?", (status, hop_id))
 
 
-# Transaction Log
-def log_transaction(chain_id: int, event_type: str, hop_id: Optional[int] = None, txid: Optional[str] = None,
-                    amount_sats: Optional[int] = None, fee_sats: Optional[int] = None,
-                    block_height: Optional[int] = None, details: Optional[str] = None):
+def update_hops_status(hop_ids: List[int], status: str):
+    """Set the same status on several hops with one UPDATE."""
+    if not hop_ids:
+        return
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        placeholders = ",".join("?" * len(hop_ids))
+        cursor.execute(f"UPDATE relay_hops SET status = ? WHERE id IN ({placeholders})", (status, *hop_ids))
+
+
+def mark_chain_hops_relayed(chain_id: int):
+    """Mark every hop of a chain that is not yet relayed as relayed, with one UPDATE."""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "UPDATE relay_hops SET status = 'relayed' WHERE chain_id = ? AND status <> 'relayed'", (chain_id,)
+        )
+
+
+def get_chain_hop_totals(chain_id: int) -> Tuple[int, Optional[int]]:
+    """(total outgoing fees, last hop's outgoing amount or None) for a chain, in one query."""
     with get_connection() as conn:
         cursor = conn.cursor()
         cursor.execute("""
+            SELECT COALESCE(SUM(outgoing_fee_sats), 0),
+                (SELECT outgoing_amount_sats FROM relay_hops
+                 WHERE chain_id = ? AND outgoing_amount_sats IS NOT NULL
+                 ORDER BY hop_number DESC LIMIT 1)
+            FROM relay_hops WHERE chain_id = ?
+        """, (chain_id, chain_id))
+        total_fees, last_amount = cursor.fetchone()
+        return total_fees, last_amount
+
+
+# Transaction Log
+# Transaction log columns, in insert order
+LOG_COLUMNS = ('chain_id', 'hop_id', 'event_type', 'txid', 'amount_sats', 'fee_sats', 'block_height', 'details')
+
+
+def _log_row(entry: Dict[str, Any]) -> Tuple:
+    details = entry.get('details')
+    if isinstance(details, dict):
+        details = orjson.dumps(details).decode('utf-8')
+    return tuple(details if col == 'details' else entry.get(col) for col in LOG_COLUMNS)
+
+
+def log_transactions(entries: List[Dict[str, Any]], conn: Optional[sqlite3.Connection] = None):
+    """Insert several log entries (dicts keyed by LOG_COLUMNS) with one executemany."""
+    if not entries:
+        return
+    with get_connection(conn) as conn:
+        cursor = conn.cursor()
+        cursor.executemany("""
             INSERT INTO transaction_log (chain_id, hop_id, event_type, txid, amount_sats, fee_sats, block_height, details)
             VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        """, (chain_id, hop_id, event_type, txid, amount_sats, fee_sats, block_height, details))
+        """, [_log_row(entry) for entry in entries])
+
+
+def log_transaction(chain_id: int, event_type: str, hop_id: Optional[int] = None, txid: Optional[str] = None,
+                    amount_sats: Optional[int] = None, fee_sats: Optional[int] = None,
+                    block_height: Optional[int] = None, details: Optional[Union[str, Dict[str, Any]]] = None,
+                    conn: Optional[sqlite3.Connection] = None):
+    """Insert one log entry. Dict details are stored as JSON."""
+    log_transactions([{
+        'chain_id': chain_id, 'hop_id': hop_id, 'event_type': event_type, 'txid': txid,
+        'amount_sats': amount_sats, 'fee_sats': fee_sats, 'block_height': block_height, 'details': details
+    }], conn=conn)
 
 
-def get_transaction_log(chain_id: int) -> List[Dict[str, Any]]:
+def get_transaction_log(chain_id: int, limit: Optional[int] = None, offset: int = 0) -> List[Dict[str, Any]]:
     with get_connection() as conn:
         cursor = conn.cursor()
-        cursor.execute("SELECT * FROM transaction_log WHERE chain_id = ? ORDER BY created_at ASC", (chain_id,))
+        # LIMIT -1 means no limit in SQLite
+        cursor.execute("""
+            SELECT * FROM transaction_log WHERE chain_id = ? ORDER BY created_at ASC, id ASC LIMIT ? OFFSET ?
+        """, (chain_id, -1 if limit is None else limit, offset))
         return [dict(row) for row in cursor.fetchall()]
 
 
-# Block Tracker
-def get_last_block_height(network: str) -> Optional[int]:
+# Pending Broadcasts
+def save_pending_broadcast(chain_id: int, source_index: int, tx_hex: str, amount_sats: int,
+                           fee_sats: int, balance_sats: int, first_seen_block: int):
+    """Record a chain's signed relay transaction before it is broadcast, replacing any earlier one."""
     with get_connection() as conn:
         cursor = conn.cursor()
-        cursor.execute("SELECT last_height FROM block_tracker WHERE network = ?", (network,))
-        row = cursor.fetchone()
-        return row['last_height'] if row else None
+        cursor.execute("""
+            INSERT OR REPLACE INTO pending_broadcasts (chain_id, source_index, tx_hex, amount_sats, fee_sats,
+                balance_sats, first_seen_block, next_attempt_block)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, (chain_id, source_index, tx_hex, amount_sats, fee_sats, balance_sats, first_seen_block, first_seen_block))
 
 
-def update_block_height(network: str, height: int, block_hash: Optional[str] = None):
+def get_pending_broadcasts(chain_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+    """Pending broadcasts for several chains in one query, keyed by chain id."""
+    if not chain_ids:
+        return {}
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        placeholders = ",".join("?" * len(chain_ids))
+        cursor.execute(f"SELECT * FROM pending_broadcasts WHERE chain_id IN ({placeholders})", list(chain_ids))
+        return {row['chain_id']: dict(row) for row in cursor.fetchall()}
+
+
+def reschedule_pending_broadcast(chain_id: int, next_attempt_block: int):
+    """Count a failed attempt and set the block from which the broadcast is retried."""
     with get_connection() as conn:
         cursor = conn.cursor()
         cursor.execute("""
-            INSERT INTO block_tracker (network, last_height, last_hash, updated_at)
-            VALUES (?, ?, ?, CURRENT_TIMESTAMP)
-            ON CONFLICT(network) DO UPDATE SET last_height = ?, last_hash = ?, updated_at = CURRENT_TIMESTAMP
-        """, (network, height, block_hash, height, block_hash))
+            UPDATE pending_broadcasts SET attempts = attempts + 1, next_attempt_block = ? WHERE chain_id = ?
+        """, (next_attempt_block, chain_id))
+
+
+def delete_pending_broadcast(chain_id: int):
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM pending_broadcasts WHERE chain_id = ?", (chain_id,))
+
+
+# Block Tracker
+# Last (height, hash) per network, filled on first read and kept in step by
+# update_block_height (once committed) so the engine's poll loop doesn't query the table.
+_BLOCK_HEIGHT_CACHE: Dict[str, Tuple[Optional[int], Optional[str]]] = {}
+_block_height_lock = threading.RLock()
+
+
+def get_last_block_height(network: str) -> Optional[int]:
+    with _block_height_lock:
+        if network in _BLOCK_HEIGHT_CACHE:
+            return _BLOCK_HEIGHT_CACHE[network][0]
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT last_height, last_hash FROM block_tracker WHERE network = ?", (network,))
+            row = cursor.fetchone()
+        _BLOCK_HEIGHT_CACHE[network] = (row['last_height'], row['last_hash']) if row else (None, None)
+        return _BLOCK_HEIGHT_CACHE[network][0]
+
+
+def update_block_height(network: str, height: int, block_hash: Optional[str] = None):
+    """Record the tip for network; a no-op if it matches what was last written."""
+    with _block_height_lock:
+        if _BLOCK_HEIGHT_CACHE.get(network) == (height, block_hash):
+            return
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(UPDATE_BLOCK_HEIGHT_SQL, (network, height, block_hash))
+            _after_commit(lambda: _cache_block_height(network, height, block_hash))
+
+
+def _cache_block_height(network: str, height: int, block_hash: Optional[str]):
+    with _block_height_lock:
+        _BLOCK_HEIGHT_CACHE[network] = (height, block_hash)
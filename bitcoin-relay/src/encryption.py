@@ -3,16 +3,23 @@ Encryption utilities for secure key storage.
 Uses AES-256-GCM with PBKDF2 key derivation.
 """
 import os
-import base64
+import binascii
 import hashlib
+import hmac
+from functools import lru_cache
+from typing import List
 from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.backends import default_backend
 
 from .config import SALT_LENGTH, KEY_LENGTH, ITERATIONS
 
 
+# Encrypted values are base64(salt || nonce || ciphertext)
+NONCE_LENGTH = 12
+_NONCE_END = SALT_LENGTH + NONCE_LENGTH
+
+
 class EncryptionError(Exception):
     """Raised when encryption/decryption fails."""
     pass
@@ -27,38 +34,59 @@ class KeyEncryption:
             algorithm=hashes.SHA256(),
             length=KEY_LENGTH,
             salt=salt,
-            iterations=ITERATIONS,
-            backend=default_backend()
+            iterations=ITERATIONS
         )
         return kdf.derive(password.encode('utf-8'))
     
+    @staticmethod
+    @lru_cache(maxsize=256)
+    def cached_key(password: str, salt: bytes) -> bytes:
+        """Derived key for (password, salt), computed once and kept in memory."""
+        return KeyEncryption.derive_key(password, salt)
+    
+    @staticmethod
+    @lru_cache(maxsize=256)
+    def cipher(password: str, salt: bytes) -> AESGCM:
+        """AES-GCM cipher for (password, salt), so repeated calls skip the key schedule too."""
+        return AESGCM(KeyEncryption.cached_key(password, salt))
+    
+    @staticmethod
+    def preload_for(encrypted_items: List[str], password: str):
+        """Derive the keys for every distinct salt among encrypted_items, ahead of decrypting them."""
+        salts = {binascii.a2b_base64(encrypted_data)[:SALT_LENGTH] for encrypted_data in encrypted_items}
+        for salt in salts:
+            KeyEncryption.cipher(password, salt)
+    
     @staticmethod
     def encrypt(plaintext: str, password: str) -> str:
         try:
             salt = os.urandom(SALT_LENGTH)
-            nonce = os.urandom(12)
-            key = KeyEncryption.derive_key(password, salt)
-            aesgcm = AESGCM(key)
+            nonce = os.urandom(NONCE_LENGTH)
+            aesgcm = KeyEncryption.cipher(password, salt)
             ciphertext = aesgcm.encrypt(nonce, plaintext.encode('utf-8'), None)
-            encrypted_data = salt + nonce + ciphertext
-            return base64.b64encode(encrypted_data).decode('utf-8')
+            encrypted_data = b''.join((salt, nonce, ciphertext))
+            return binascii.b2a_base64(encrypted_data, newline=False).decode('ascii')
         except Exception as e:
             raise EncryptionError(f"Encryption failed: {str(e)}")
     
     @staticmethod
     def decrypt(encrypted_data: str, password: str) -> str:
         try:
-            data = base64.b64decode(encrypted_data)
+            data = binascii.a2b_base64(encrypted_data)
             salt = data[:SALT_LENGTH]
-            nonce = data[SALT_LENGTH:SALT_LENGTH + 12]
-            ciphertext = data[SALT_LENGTH + 12:]
-            key = KeyEncryption.derive_key(password, salt)
-            aesgcm = AESGCM(key)
+            nonce = data[SALT_LENGTH:_NONCE_END]
+            ciphertext = data[_NONCE_END:]
+            aesgcm = KeyEncryption.cipher(password, salt)
             plaintext = aesgcm.decrypt(nonce, ciphertext, None)
             return plaintext.decode('utf-8')
         except Exception:
             raise EncryptionError("Decryption failed - wrong password or corrupted data")
     
+    @staticmethod
+    def decrypt_many(encrypted_items: List[str], password: str) -> List[str]:
+        """Decrypt several values; the cipher cache derives the key once per distinct salt."""
+        return [KeyEncryption.decrypt(encrypted_data, password) for encrypted_data in encrypted_items]
+    
     @staticmethod
     def verify_password(encrypted_data: str, password: str) -> bool:
         try:
@@ -72,16 +100,16 @@ def generate_password_hash(password: str) -> str:
     salt = os.urandom(SALT_LENGTH)
     key = KeyEncryption.derive_key(password, salt)
     hash_value = hashlib.sha256(key).digest()
-    return base64.b64encode(salt + hash_value).decode('utf-8')
+    return binascii.b2a_base64(salt + hash_value, newline=False).decode('ascii')
 
 
 def verify_password_hash(password: str, stored_hash: str) -> bool:
     try:
-        data = base64.b64decode(stored_hash)
+        data = binascii.a2b_base64(stored_hash)
         salt = data[:SALT_LENGTH]
         stored_hash_value = data[SALT_LENGTH:]
         key = KeyEncryption.derive_key(password, salt)
         computed_hash = hashlib.sha256(key).digest()
-        return computed_hash == stored_hash_value
+        return hmac.compare_digest(computed_hash, stored_hash_value)
     except Exception:
         return False
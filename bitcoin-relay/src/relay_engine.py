@@ -5,26 +5,101 @@ Includes auto-recovery for stuck/failed chains.
 import threading
 import time
 import logging
-from typing import Optional, Dict, List, Any
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Optional, Dict, List, Any, Tuple
 
-from .config import BLOCK_POLL_INTERVAL
-from .bitcoin_utils import BitcoinAPI, WalletManager
+from .config import (
+    BLOCK_POLL_INTERVAL, BROADCAST_MAX_ATTEMPTS, BROADCAST_RETRY_DELAYS, ENGINE_CHAIN_WORKERS,
+    ENGINE_FULL_SWEEP_INTERVAL, ENGINE_IDLE_BACKOFF_MAX
+)
+from .bitcoin_utils import BitcoinAPI, WalletManager, get_bitcoin_api, get_wallet_manager
 from .encryption import KeyEncryption
 from .database import (
-    get_all_relay_chains, get_relay_hops, update_hop_funded,
+    get_active_chains, get_relay_hops, get_relay_hops_for_chains, update_hop_funded,
     update_hop_relayed, update_chain_amounts, update_chain_status,
     get_last_block_height, update_block_height, log_transaction,
-    update_hop_status, get_relay_chain
+    mark_chain_hops_relayed, get_chain_hop_totals, get_relay_chain, db_transaction,
+    save_pending_broadcast, get_pending_broadcasts, reschedule_pending_broadcast, delete_pending_broadcast
 )
 
-# Set up logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger('RelayEngine')
 
 
+def _configure_default_logging():
+    """Give the engine's INFO logs somewhere to go, unless the host app already configured logging."""
+    if not logging.getLogger().handlers:
+        logging.basicConfig(
+            level=logging.INFO,
+            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+        )
+
+# Chains are independent and their work is mostly upstream API round trips,
+# so a cycle checks several at once
+_chain_pool = ThreadPoolExecutor(max_workers=ENGINE_CHAIN_WORKERS, thread_name_prefix='relay-chain')
+
+# Per-chain locks, so an engine cycle and a manual relay never move the same chain's funds at once
+_chain_locks: Dict[int, threading.Lock] = {}
+_chain_locks_guard = threading.Lock()
+
+
+def chain_lock(chain_id: int) -> threading.Lock:
+    """The lock held while relaying a chain's funds."""
+    with _chain_locks_guard:
+        return _chain_locks.setdefault(chain_id, threading.Lock())
+
+
+class StatusNotifier:
+    """Version counter that wakes status stream listeners when relay state changes."""
+    
+    def __init__(self):
+        self._changed = threading.Condition()
+        self.version = 0
+    
+    def notify(self):
+        with self._changed:
+            self.version += 1
+            self._changed.notify_all()
+    
+    def wait(self, version: int, timeout: float) -> int:
+        """Block until the version moves past `version` or the timeout expires; return the current version."""
+        with self._changed:
+            self._changed.wait_for(lambda: self.version != version, timeout)
+            return self.version
+
+
+status_notifier = StatusNotifier()
+
+
+@dataclass(frozen=True)
+class FundsLocation:
+    """A relay step's source: the chain's intake (index -1) or hops[index]."""
+    kind: str  # 'intake' or 'hop'
+    index: int
+    data: Dict[str, Any]
+    
+    @classmethod
+    def intake(cls, chain: Dict[str, Any]) -> 'FundsLocation':
+        return cls('intake', -1, chain)
+    
+    @classmethod
+    def hop(cls, index: int, hop: Dict[str, Any]) -> 'FundsLocation':
+        return cls('hop', index, hop)
+    
+    @property
+    def name(self) -> str:
+        """Label used in status messages and manual relay results, e.g. 'intake' or 'hop_2'."""
+        return 'intake' if self.kind == 'intake' else f'hop_{self.index + 1}'
+    
+    @property
+    def address(self) -> str:
+        return self.data['intake_address'] if self.kind == 'intake' else self.data['address']
+    
+    @property
+    def privkey_encrypted(self) -> str:
+        return self.data['intake_privkey_encrypted'] if self.kind == 'intake' else self.data['privkey_encrypted']
+
+
 class RelayEngine:
     """
     Background engine that monitors blocks and processes relays.
@@ -41,15 +116,25 @@ class RelayEngine:
         """
         self.network = network
         self.password = password
-        self.api = BitcoinAPI(network)
-        self.wallet = WalletManager(network)
+        self.api = get_bitcoin_api(network)
+        self.wallet = get_wallet_manager(network)
         self.is_running = False
         self._thread: Optional[threading.Thread] = None
         self._stop_event = threading.Event()
         self.last_error: Optional[str] = None
-        self.processing_status: Dict[int, str] = {}  # chain_id -> status message
+        # chain_id -> status message as of the last sweep. Each sweep fills a fresh
+        # dict and publishes it whole when done, so readers never see it change.
+        self.processing_status: Dict[int, str] = {}
+        self._status_next: Dict[int, str] = {}
+        # Tip of the last full sweep over active chains, and whether anything in it failed
+        self._swept_block: Optional[int] = None
+        self._sweep_failed = False
+        # Whether the current sweep checks every hop (see _hop_window), and sweeps so far
+        self._full_sweep = True
+        self._sweep_count = 0
         
-        logger.info(f"Relay engine initialized for {network}")
+        _configure_default_logging()
+        logger.info("Relay engine initialized for %s", network)
     
     def start(self):
         """Start the relay engine in a background thread."""
@@ -61,6 +146,7 @@ class RelayEngine:
         self._thread = threading.Thread(target=self._run, daemon=True)
         self._thread.start()
         self.is_running = True
+        status_notifier.notify()
         logger.info("Relay engine started")
     
     def stop(self):
@@ -70,6 +156,7 @@ class RelayEngine:
         if self._thread:
             self._thread.join(timeout=10)
         self.is_running = False
+        status_notifier.notify()
         logger.info("Relay engine stopped")
     
     def get_status(self) -> Dict[str, Any]:
@@ -78,167 +165,350 @@ class RelayEngine:
             'running': self.is_running,
             'network': self.network,
             'last_error': self.last_error,
-            'processing': self.processing_status.copy()
+            'processing': self.processing_status
         }
     
     def _run(self):
         """Main engine loop."""
         logger.info("Relay engine loop started")
+        self._preload_keys()
         
+        interval = BLOCK_POLL_INTERVAL
         while not self._stop_event.is_set():
-            try:
-                self._process_cycle()
-                self.last_error = None
-            except Exception as e:
-                self.last_error = str(e)
-                logger.error(f"Error in relay cycle: {e}", exc_info=True)
+            started = time.monotonic()
+            busy = self._run_cycle()
             
-            # Wait before next poll (check every 30 seconds for faster response)
-            self._stop_event.wait(30)
+            # Polls start every interval regardless of how long the cycle took;
+            # back off while there is nothing to relay
+            if busy:
+                interval = BLOCK_POLL_INTERVAL
+            else:
+                interval = min(interval * 2, BLOCK_POLL_INTERVAL * ENGINE_IDLE_BACKOFF_MAX)
+            self._stop_event.wait(max(0.0, started + interval - time.monotonic()))
         
         logger.info("Relay engine loop ended")
     
-    def _process_cycle(self):
-        """Process one cycle of checking and relaying."""
+    def _run_cycle(self) -> bool:
+        """
+        Run one cycle, recording its error, and wake status listeners only if the engine
+        status changed, so a skipped or idle cycle leaves status ETags valid.
+        Returns whether the engine has work (see _process_cycle).
+        """
+        before = (self.processing_status, self.last_error)
+        try:
+            busy = self._process_cycle()
+            self.last_error = None
+        except Exception as e:
+            busy = True
+            self.last_error = str(e)
+            logger.error("Error in relay cycle: %s", e, exc_info=True)
+        if (self.processing_status, self.last_error) != before:
+            status_notifier.notify()
+        return busy
+    
+    def _preload_keys(self):
+        """Derive the decryption keys for active chains up front, so the first relay doesn't wait on PBKDF2."""
+        try:
+            active_chains = get_active_chains(self.network)
+            hops_by_chain = get_relay_hops_for_chains([c['id'] for c in active_chains])
+            encrypted = [c['intake_privkey_encrypted'] for c in active_chains]
+            encrypted.extend(hop['privkey_encrypted'] for hops in hops_by_chain.values() for hop in hops)
+            KeyEncryption.preload_for(encrypted, self.password)
+        except Exception as e:
+            logger.warning("Key preload failed: %s", e)
+    
+    def _process_cycle(self) -> bool:
+        """Process one cycle of checking and relaying. Returns False if there were no active chains."""
         # Get current block height
         try:
             current_block = self.api.get_block_height()
         except Exception as e:
-            logger.error(f"Failed to get block height: {e}")
-            return
+            logger.error("Failed to get block height: %s", e)
+            return True
         
         # Get active chains for this network
-        chains = get_all_relay_chains(self.network)
-        active_chains = [c for c in chains if c['status'] == 'active']
+        active_chains = get_active_chains(self.network)
         
         if not active_chains:
             logger.debug("No active chains to process")
             update_block_height(self.network, current_block)
-            return
+            return False
         
-        logger.info(f"Processing {len(active_chains)} active chains at block {current_block}")
+        # Relays only move confirmed funds, so until the next block a new sweep
+        # would see the same balances; only a failed relay is worth retrying early
+        if current_block == self._swept_block and not self._sweep_failed:
+            logger.debug("No new block since %d; skipping sweep", current_block)
+            return True
         
-        # Process each active chain
-        for chain in active_chains:
-            try:
-                self._process_chain(chain, current_block)
-            except Exception as e:
-                logger.error(f"Error processing chain {chain['id']}: {e}", exc_info=True)
-                self.processing_status[chain['id']] = f"Error: {str(e)}"
+        logger.info("Processing %d active chains at block %d", len(active_chains), current_block)
+        
+        # Load hops and any broadcasts awaiting retry for all active chains, one query each
+        chain_ids = [c['id'] for c in active_chains]
+        hops_by_chain = get_relay_hops_for_chains(chain_ids)
+        pending_broadcasts = get_pending_broadcasts(chain_ids)
+        
+        # Every balance the sweep reads, fetched concurrently as one batch
+        self._full_sweep = self._sweep_count % ENGINE_FULL_SWEEP_INTERVAL == 0
+        self._sweep_count += 1
+        balances = self._chain_balances(active_chains, hops_by_chain)
+        self._swept_block = current_block
+        self._sweep_failed = False
+        self._status_next = {}
+        
+        # Process active chains concurrently; wait for all before recording the block
+        list(_chain_pool.map(
+            lambda chain: self._process_chain_safely(
+                chain, current_block, hops_by_chain[chain['id']], balances, pending_broadcasts
+            ),
+            active_chains
+        ))
+        self.processing_status = self._status_next
         
         # Update tracked block height
         update_block_height(self.network, current_block)
+        return True
     
-    def _process_chain(self, chain: Dict[str, Any], current_block: int):
-        """Process a single relay chain with auto-recovery."""
+    def _chain_balances(self, chains: List[Dict[str, Any]],
+                        hops_by_chain: Dict[int, List[Dict[str, Any]]]) -> Dict[str, Tuple[int, int]]:
+        """(confirmed, unconfirmed) balance of each chain's intake, final, and windowed hop addresses."""
+        addresses = []
+        for chain in chains:
+            hops = hops_by_chain[chain['id']]
+            addresses.append(chain['intake_address'])
+            addresses.extend(hops[i]['address'] for i in self._hop_window(chain, hops))
+            addresses.append(chain['final_address'])
+        return dict(zip(addresses, self.api.get_address_balances(addresses)))
+    
+    def _hop_window(self, chain: Dict[str, Any], hops: List[Dict[str, Any]]) -> range:
+        """
+        Indices of the hops that can hold a chain's funds: hops[current_hop], where the last
+        recorded relay sent them, and the next one in case a broadcast wasn't recorded.
+        Every hop on a full sweep, which catches funds moved outside the engine.
+        """
+        if self._full_sweep:
+            return range(len(hops))
+        start = min(chain['current_hop'] or 0, len(hops))
+        return range(start, min(start + 2, len(hops)))
+    
+    def _process_chain_safely(self, chain: Dict[str, Any], current_block: int, hops: List[Dict[str, Any]],
+                              balances: Dict[str, Tuple[int, int]],
+                              pending_broadcasts: Dict[int, Dict[str, Any]]):
+        """Process one chain, logging errors so they don't affect the other chains."""
+        try:
+            self._process_chain(chain, current_block, hops, balances, pending_broadcasts)
+        except Exception as e:
+            logger.error("Error processing chain %d: %s", chain['id'], e, exc_info=True)
+            self._status_next[chain['id']] = f"Error: {str(e)}"
+            self._sweep_failed = True
+    
+    def _process_chain(self, chain: Dict[str, Any], current_block: int,
+                       hops: Optional[List[Dict[str, Any]]] = None,
+                       balances: Optional[Dict[str, Tuple[int, int]]] = None,
+                       pending_broadcasts: Optional[Dict[int, Dict[str, Any]]] = None):
+        """Process a single relay chain with auto-recovery, unless a manual relay holds its lock."""
+        lock = chain_lock(chain['id'])
+        if not lock.acquire(blocking=False):
+            # Balances read for this sweep may predate the manual relay; look again next cycle
+            self._status_next[chain['id']] = "Manual relay in progress"
+            self._sweep_failed = True
+            return
+        try:
+            self._process_chain_locked(chain, current_block, hops, balances, pending_broadcasts)
+        finally:
+            lock.release()
+    
+    def _process_chain_locked(self, chain: Dict[str, Any], current_block: int,
+                              hops: Optional[List[Dict[str, Any]]],
+                              balances: Optional[Dict[str, Tuple[int, int]]],
+                              pending_broadcasts: Optional[Dict[int, Dict[str, Any]]]):
         chain_id = chain['id']
-        hops = get_relay_hops(chain_id)
+        if hops is None:
+            hops = get_relay_hops(chain_id)
         
         if not hops:
-            logger.warning(f"Chain {chain_id} has no hops")
+            logger.warning("Chain %d has no hops", chain_id)
             return
         
-        self.processing_status[chain_id] = "Checking..."
+        self._status_next[chain_id] = "Checking..."
+        if balances is None:
+            balances = self._chain_balances([chain], {chain_id: hops})
+        if pending_broadcasts is None:
+            pending_broadcasts = get_pending_broadcasts([chain_id])
+        pending = pending_broadcasts.get(chain_id)
         
         # Step 1: Check intake address for funds
-        intake_balance = self.api.get_address_balance(chain['intake_address'])
+        intake_balance = balances[chain['intake_address']]
         intake_confirmed = intake_balance[0]
         
         # Step 2: Find where funds currently are and relay them
-        funds_location = self._find_funds_location(chain, hops)
+        funds_location = self._find_funds_location(chain, hops, balances)
         
         if funds_location:
-            location_type, location_data, balance = funds_location
-            self.processing_status[chain_id] = f"Funds at {location_type}: {balance} sats"
+            location, balance = funds_location
+            self._status_next[chain_id] = f"Funds at {location.name}: {balance} sats"
+            
+            if pending and pending['source_index'] != location.index:
+                # Funds moved on since the transaction was signed; it can no longer confirm
+                logger.warning("Chain %d: Dropping pending broadcast from %s", chain_id, location.name)
+                delete_pending_broadcast(chain_id)
+                pending = None
+            if pending and pending['next_attempt_block'] > current_block:
+                self._status_next[chain_id] = f"Broadcast retry at block {pending['next_attempt_block']}"
+                return
             
             # Attempt to relay from current location
-            self._relay_from_location(chain, hops, location_type, location_data, balance, current_block)
+            self._relay_from_location(chain, hops, location, current_block, pending)
         else:
             # No funds found anywhere - check if chain is complete
-            final_balance = self.api.get_address_balance(chain['final_address'])
+            final_balance = balances[chain['final_address']]
             if final_balance[0] > 0 or final_balance[1] > 0:
-                self._complete_chain(chain, hops)
+                self._complete_chain(chain)
             elif intake_confirmed == 0 and intake_balance[1] == 0:
-                self.processing_status[chain_id] = "Waiting for funds at intake"
+                self._status_next[chain_id] = "Waiting for funds at intake"
             else:
-                self.processing_status[chain_id] = "Funds in transit"
+                self._status_next[chain_id] = "Funds in transit"
     
-    def _find_funds_location(self, chain: Dict, hops: List[Dict]) -> Optional[tuple]:
+    def _find_funds_location(self, chain: Dict, hops: List[Dict],
+                             balances: Dict[str, Tuple[int, int]]) -> Optional[Tuple[FundsLocation, int]]:
         """
-        Find where the funds currently are in the relay chain.
-        Returns: (location_type, location_data, confirmed_balance) or None
+        Find where the funds currently are in the relay chain, given the balances of its addresses.
+        Returns: (location, confirmed_balance) or None
         """
         # Check intake address first
-        intake_balance = self.api.get_address_balance(chain['intake_address'])
+        intake_balance = balances[chain['intake_address']]
         if intake_balance[0] > 0:  # Confirmed balance at intake
-            return ('intake', chain, intake_balance[0])
+            return (FundsLocation.intake(chain), intake_balance[0])
         
-        # Check each hop
-        for i, hop in enumerate(hops):
-            hop_balance = self.api.get_address_balance(hop['address'])
+        # Check each hop that can hold the funds
+        for i in self._hop_window(chain, hops):
+            hop_balance = balances[hops[i]['address']]
             if hop_balance[0] > 0:  # Confirmed balance
-                return (f'hop_{i+1}', hop, hop_balance[0])
+                return (FundsLocation.hop(i, hops[i]), hop_balance[0])
         
         return None
     
-    def _relay_from_location(self, chain: Dict, hops: List[Dict], 
-                             location_type: str, location_data: Dict,
-                             balance: int, current_block: int):
-        """Relay funds from their current location to the next destination."""
-        chain_id = chain['id']
-        
-        try:
-            # Determine source and destination
-            if location_type == 'intake':
-                # Relay from intake to first hop
-                source_privkey_enc = chain['intake_privkey_encrypted']
-                destination = hops[0]['address']
-                dest_hop_index = 0
-                desc = "Intake -> Hop 1"
+    def _relay_from_location(self, chain: Dict, hops: List[Dict], location: FundsLocation, current_block: int,
+                             pending: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Relay funds one step with relay_step, recording the outcome in this sweep's status."""
+        result = relay_step(self.api, self.wallet, self.password, chain, hops, location, current_block, pending)
+        self._status_next[chain['id']] = result['message']
+        if result['status'] == 'error':
+            self._sweep_failed = True
+        return result
+    
+    def _complete_chain(self, chain: Dict):
+        """Mark a chain as completed."""
+        complete_chain(self.api, chain)
+        self._status_next[chain['id']] = "COMPLETED"
+
+
+def relay_step(api: BitcoinAPI, wallet: WalletManager, password: str, chain: Dict, hops: List[Dict],
+               location: FundsLocation, current_block: int, pending: Optional[Dict[str, Any]] = None,
+               event_type: str = 'relay_sent') -> Dict[str, Any]:
+    """
+    Relay funds from their current location to the next destination, completing the chain
+    when they reach its final address. Callers hold the chain's chain_lock.
+    With a pending broadcast, re-broadcasts its signed transaction instead of building a new one.
+    Returns the step's result: its status ('success', 'skipped', 'retry' or 'error'), a status
+    message for the chain, and details.
+    """
+    chain_id = chain['id']
+    step = location.name
+    
+    try:
+        # Determine source and destination
+        source_privkey_enc = location.privkey_encrypted
+        hop_index = location.index
+        if location.kind == 'intake':
+            # Relay from intake to first hop
+            destination = hops[0]['address']
+            dest_hop_index = 0
+            desc = "Intake -> Hop 1"
+        else:
+            # Relay from hop N to hop N+1 or final
+            if hop_index < len(hops) - 1:
+                destination = hops[hop_index + 1]['address']
+                dest_hop_index = hop_index + 1
+                desc = f"Hop {hop_index + 1} -> Hop {hop_index + 2}"
             else:
-                # Relay from hop N to hop N+1 or final
-                hop_index = int(location_type.split('_')[1]) - 1
-                source_privkey_enc = hops[hop_index]['privkey_encrypted']
-                
-                if hop_index < len(hops) - 1:
-                    destination = hops[hop_index + 1]['address']
-                    dest_hop_index = hop_index + 1
-                    desc = f"Hop {hop_index + 1} -> Hop {hop_index + 2}"
-                else:
-                    destination = chain['final_address']
-                    dest_hop_index = -1  # Final destination
-                    desc = f"Hop {hop_index + 1} -> Final"
-            
-            self.processing_status[chain_id] = f"Relaying: {desc}"
-            logger.info(f"Chain {chain_id}: {desc}")
+                destination = chain['final_address']
+                dest_hop_index = -1  # Final destination
+                desc = f"Hop {hop_index + 1} -> Final"
+        
+        if pending is None:
+            logger.info("Chain %d: %s", chain_id, desc)
             
             # Decrypt private key
-            privkey = KeyEncryption.decrypt(source_privkey_enc, self.password)
+            privkey = KeyEncryption.decrypt(source_privkey_enc, password)
             
             # Get fee estimate
-            fees = self.api.get_fee_estimates()
+            fees = api.get_fee_estimates()
             fee_sats = max(fees['medium'].estimated_fee_sats, 200)  # Minimum 200 sats
             
-            # Create and broadcast transaction
-            key = self.wallet.get_key_from_wif(privkey)
-            actual_balance = int(key.get_balance('satoshi'))
+            # Create transaction
+            key = wallet.get_key_from_wif(privkey)
+            actual_balance = api.load_unspents(key)
             
             if actual_balance <= fee_sats:
-                logger.warning(f"Chain {chain_id}: Insufficient balance ({actual_balance}) for fee ({fee_sats})")
-                self.processing_status[chain_id] = f"Insufficient balance: {actual_balance} sats"
-                return
+                logger.warning("Chain %d: Insufficient balance (%d) for fee (%d)", chain_id, actual_balance, fee_sats)
+                return {'step': step, 'status': 'skipped', 'message': f"Insufficient balance: {actual_balance} sats",
+                        'reason': f'Insufficient balance: {actual_balance}'}
             
             amount_to_send = actual_balance - fee_sats
             
             outputs = [(destination, amount_to_send, 'satoshi')]
-            tx_hex = key.create_transaction(outputs, fee=fee_sats, absolute_fee=True)
-            txid = self.api.broadcast_transaction(tx_hex)
+            # Spend the unspents just loaded; without them bit fetches its own
+            tx_hex = key.create_transaction(outputs, fee=fee_sats, absolute_fee=True, unspents=key.unspents)
             
-            logger.info(f"Chain {chain_id}: Broadcast {desc} - TXID: {txid}")
-            self.processing_status[chain_id] = f"Sent: {desc} ({amount_to_send} sats)"
-            
-            # Update database
-            if location_type == 'intake':
+            # Keep the signed transaction so a transient broadcast failure retries it as-is
+            save_pending_broadcast(chain_id, location.index, tx_hex, amount_to_send, fee_sats,
+                                   actual_balance, current_block)
+            attempts = 0
+        else:
+            logger.info("Chain %d: %s (retrying broadcast)", chain_id, desc)
+            tx_hex, attempts = pending['tx_hex'], pending['attempts']
+            amount_to_send, fee_sats = pending['amount_sats'], pending['fee_sats']
+            actual_balance = pending['balance_sats']
+        
+        # Broadcast transaction
+        try:
+            txid = api.broadcast_transaction(tx_hex)
+        except Exception as e:
+            if not api.is_already_broadcast_error(e):
+                fee_floor = api.is_fee_floor_error(e)
+                if not fee_floor and not api.is_retryable_broadcast_error(e):
+                    delete_pending_broadcast(chain_id)
+                    raise
+                if fee_floor or attempts + 1 >= BROADCAST_MAX_ATTEMPTS:
+                    # Replaying the signed transaction can't get past a fee floor (or has failed
+                    # too often); the next block builds a new one at the fee estimate of the time
+                    delete_pending_broadcast(chain_id)
+                    retry_block = current_block + 1
+                    message = f"Rebuilding transaction at block {retry_block}"
+                else:
+                    retry_block = current_block + BROADCAST_RETRY_DELAYS[attempts]
+                    reschedule_pending_broadcast(chain_id, retry_block)
+                    message = f"Broadcast retry at block {retry_block}"
+                logger.warning("Chain %d: Broadcast %s failed (%s); %s", chain_id, desc, e, message)
+                log_transaction(
+                    chain_id=chain_id,
+                    event_type='broadcast_retry',
+                    block_height=current_block,
+                    details=str(e)
+                )
+                return {'step': step, 'status': 'retry', 'message': message,
+                        'error': str(e), 'retry_at_block': retry_block}
+            # An earlier attempt got through (its response was lost); record it like any other broadcast
+            from bit.transaction import calc_txid
+            txid = calc_txid(tx_hex)
+            logger.info("Chain %d: %s was already broadcast", chain_id, desc)
+        
+        logger.info("Chain %d: Broadcast %s - TXID: %s", chain_id, desc, txid)
+        message = f"Sent: {desc} ({amount_to_send} sats)"
+        
+        # Update database
+        with db_transaction():
+            if location.kind == 'intake':
                 # Update chain received amount
                 update_chain_amounts(chain_id, amount_received_sats=actual_balance)
                 
@@ -251,8 +521,6 @@ class RelayEngine:
                     relay_at_block=current_block
                 )
             else:
-                hop_index = int(location_type.split('_')[1]) - 1
-                
                 # Update source hop as relayed
                 update_hop_relayed(
                     hop_id=hops[hop_index]['id'],
@@ -274,49 +542,60 @@ class RelayEngine:
                 # Update chain progress
                 update_chain_amounts(chain_id, current_hop=hop_index + 1)
             
+            delete_pending_broadcast(chain_id)
+            
             # Log transaction
             log_transaction(
                 chain_id=chain_id,
-                event_type='relay_sent',
+                event_type=event_type,
                 txid=txid,
                 amount_sats=amount_to_send,
                 fee_sats=fee_sats,
                 block_height=current_block,
                 details=desc
             )
-            
-            # Check if this was the final relay
-            if dest_hop_index == -1:
-                self._complete_chain(chain, hops)
-            
-        except Exception as e:
-            logger.error(f"Chain {chain_id}: Relay failed - {e}")
-            self.processing_status[chain_id] = f"Relay failed: {str(e)[:50]}"
-            
-            log_transaction(
-                chain_id=chain_id,
-                event_type='relay_error',
-                details=str(e)
-            )
-    
-    def _complete_chain(self, chain: Dict, hops: List[Dict]):
-        """Mark a chain as completed."""
-        chain_id = chain['id']
         
-        # Calculate totals
-        total_fees = sum(h.get('outgoing_fee_sats', 0) or 0 for h in hops)
+        # Check if this was the final relay
+        if dest_hop_index == -1:
+            complete_chain(api, chain)
+            message = "COMPLETED"
         
-        # Get final amount from last hop or final destination
-        final_balance = self.api.get_address_balance(chain['final_address'])
-        final_amount = final_balance[0] + final_balance[1]
+        return {
+            'step': step,
+            'status': 'success',
+            'message': message,
+            'txid': txid,
+            'amount': amount_to_send,
+            'destination': destination
+        }
         
-        if final_amount == 0:
-            # Try to get from last hop's outgoing amount
-            for hop in reversed(hops):
-                if hop.get('outgoing_amount_sats'):
-                    final_amount = hop['outgoing_amount_sats']
-                    break
+    except Exception as e:
+        logger.error("Chain %d: Relay failed - %s", chain_id, e)
         
+        log_transaction(
+            chain_id=chain_id,
+            event_type='relay_error',
+            details=str(e)
+        )
+        return {'step': step, 'status': 'error', 'message': f"Relay failed: {str(e)[:50]}", 'error': str(e)}
+
+
+def complete_chain(api: BitcoinAPI, chain: Dict):
+    """Mark a chain as completed, recording its final amount and total fees."""
+    chain_id = chain['id']
+    
+    # Totals come from the stored hops, which include a relay made earlier in this cycle
+    total_fees, last_outgoing_amount = get_chain_hop_totals(chain_id)
+    
+    # Get final amount from last hop or final destination
+    final_balance = api.get_address_balance(chain['final_address'])
+    final_amount = final_balance[0] + final_balance[1]
+    
+    if final_amount == 0 and last_outgoing_amount:
+        # Fall back to the last hop's outgoing amount
+        final_amount = last_outgoing_amount
+    
+    with db_transaction():
         update_chain_amounts(
             chain_id,
             amount_sent_sats=final_amount,
@@ -326,9 +605,7 @@ class RelayEngine:
         update_chain_status(chain_id, 'completed')
         
         # Mark all hops as relayed
-        for hop in hops:
-            if hop['status'] != 'relayed':
-                update_hop_status(hop['id'], 'relayed')
+        mark_chain_hops_relayed(chain_id)
         
         log_transaction(
             chain_id=chain_id,
@@ -337,15 +614,11 @@ class RelayEngine:
             fee_sats=total_fees,
             details=f"Successfully relayed to {chain['final_address']}"
         )
-        
-        self.processing_status[chain_id] = "COMPLETED"
-        
-        logger.info(
-            f"Chain {chain_id}: COMPLETED! "
-            f"Received: {chain.get('amount_received_sats', 0)} sats, "
-            f"Sent: {final_amount} sats, "
-            f"Fees: {total_fees} sats"
-        )
+    
+    logger.info(
+        "Chain %d: COMPLETED! Received: %s sats, Sent: %s sats, Fees: %s sats",
+        chain_id, chain.get('amount_received_sats', 0), final_amount, total_fees
+    )
 
 
 def manual_relay_chain(chain_id: int, password: str) -> Dict[str, Any]:
@@ -353,119 +626,47 @@ def manual_relay_chain(chain_id: int, password: str) -> Dict[str, Any]:
     Manually process all pending relays for a chain.
     Useful for recovering stuck chains.
     
+    Each step goes through relay_step under the chain's lock, so it builds, broadcasts
+    and records transactions exactly as an engine cycle would, and never alongside one.
+    
     Returns dict with results of each relay attempt.
     """
-    from .database import get_relay_chain, get_relay_hops
-    
     chain = get_relay_chain(chain_id)
     if not chain:
         return {'error': 'Chain not found'}
     
-    hops = get_relay_hops(chain_id)
-    if not hops:
-        return {'error': 'No hops found'}
-    
-    api = BitcoinAPI(chain['network'])
-    wallet = WalletManager(chain['network'])
-    
-    results = []
-    current_block = api.get_block_height()
-    
-    # Find funds and relay through entire chain
-    addresses = [
-        ('intake', chain['intake_address'], chain['intake_privkey_encrypted']),
-    ]
-    for i, hop in enumerate(hops):
-        addresses.append((f'hop_{i+1}', hop['address'], hop['privkey_encrypted']))
-    
-    # Determine destinations
-    destinations = [hops[0]['address']]  # intake -> hop1
-    for i in range(len(hops) - 1):
-        destinations.append(hops[i + 1]['address'])  # hopN -> hopN+1
-    destinations.append(chain['final_address'])  # last hop -> final
-    
-    for i, (name, address, privkey_enc) in enumerate(addresses):
-        balance = api.get_address_balance(address)
-        confirmed = balance[0]
-        
-        if confirmed > 0:
-            try:
-                privkey = KeyEncryption.decrypt(privkey_enc, password)
-                key = wallet.get_key_from_wif(privkey)
-                actual_balance = int(key.get_balance('satoshi'))
-                
-                fee = 200
-                amount = actual_balance - fee
-                
-                if amount <= 0:
-                    results.append({
-                        'step': name,
-                        'status': 'skipped',
-                        'reason': f'Insufficient balance: {actual_balance}'
-                    })
-                    continue
-                
-                destination = destinations[i]
-                outputs = [(destination, amount, 'satoshi')]
-                tx_hex = key.create_transaction(outputs, fee=fee, absolute_fee=True)
-                txid = api.broadcast_transaction(tx_hex)
-                
-                results.append({
-                    'step': name,
-                    'status': 'success',
-                    'txid': txid,
-                    'amount': amount,
-                    'destination': destination
-                })
-                
-                # Update database
-                if name == 'intake':
-                    update_chain_amounts(chain_id, amount_received_sats=actual_balance)
-                    update_hop_funded(
-                        hop_id=hops[0]['id'],
-                        incoming_txid=txid,
-                        incoming_amount_sats=amount,
-                        confirmed_at_block=current_block,
-                        relay_at_block=current_block
-                    )
-                else:
-                    hop_index = int(name.split('_')[1]) - 1
-                    update_hop_relayed(
-                        hop_id=hops[hop_index]['id'],
-                        outgoing_txid=txid,
-                        outgoing_amount_sats=amount,
-                        outgoing_fee_sats=fee
-                    )
-                    if hop_index < len(hops) - 1:
-                        update_hop_funded(
-                            hop_id=hops[hop_index + 1]['id'],
-                            incoming_txid=txid,
-                            incoming_amount_sats=amount,
-                            confirmed_at_block=current_block,
-                            relay_at_block=current_block
-                        )
-                
-                log_transaction(
-                    chain_id=chain_id,
-                    event_type='manual_relay',
-                    txid=txid,
-                    amount_sats=amount,
-                    fee_sats=fee,
-                    block_height=current_block,
-                    details=f"Manual relay from {name}"
-                )
-                
-            except Exception as e:
+    api = get_bitcoin_api(chain['network'])
+    wallet = get_wallet_manager(chain['network'])
+    
+    with chain_lock(chain_id):
+        # Re-read under the lock: an engine cycle may have just moved the chain on
+        chain = get_relay_chain(chain_id)
+        hops = get_relay_hops(chain_id)
+        if not hops:
+            return {'error': 'No hops found'}
+        
+        current_block = api.get_block_height()
+        pending = get_pending_broadcasts([chain_id]).get(chain_id)
+        
+        locations: List[FundsLocation] = [FundsLocation.intake(chain)]
+        locations.extend(FundsLocation.hop(i, hop) for i, hop in enumerate(hops))
+        
+        # Every address's balance in one concurrent batch
+        balances = api.get_address_balances([location.address for location in locations])
+        
+        results = []
+        for location, balance in zip(locations, balances):
+            if balance[0] > 0:
+                # A signed transaction awaiting retry from this location is re-broadcast now
+                step_pending = pending if pending and pending['source_index'] == location.index else None
+                results.append(relay_step(
+                    api, wallet, password, chain, hops, location, current_block, step_pending, event_type='manual_relay'
+                ))
+            else:
                 results.append({
-                    'step': name,
-                    'status': 'error',
-                    'error': str(e)
+                    'step': location.name,
+                    'status': 'no_funds',
+                    'balance': balance
                 })
-        else:
-            results.append({
-                'step': name,
-                'status': 'no_funds',
-                'balance': balance
-            })
     
     return {'chain_id': chain_id, 'results': results}
@@ -0,0 +1,25 @@
+"""
+Shared fixtures for Bitcoin Relay tests.
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add project root to path (src uses package-relative imports)
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+
+@pytest.fixture
+def temp_db(tmp_path, monkeypatch):
+    """An initialized database in a temp directory, with the module caches reset around it."""
+    from src import database
+    
+    monkeypatch.setattr(database, 'DATABASE_PATH', tmp_path / 'relay.db')
+    database.invalidate_settings_cache()
+    database._BLOCK_HEIGHT_CACHE.clear()
+    database.init_database()
+    yield database
+    database.close_connections()
+    database.invalidate_settings_cache()
+    database._BLOCK_HEIGHT_CACHE.clear()
@@ -0,0 +1,186 @@
+"""
+Route tests for the Flask app, against a temp database and a stub network API.
+"""
+import pytest
+
+from src.config import MAX_HOPS
+from src.bitcoin_utils import FeeEstimate
+
+
+class StubAPI:
+    """Stand-in for BitcoinAPI with a settable tip and address balances, and fixed fees."""
+    
+    def __init__(self, height=100):
+        self.height = height
+        self.balances = {}
+    
+    def get_block_height(self):
+        return self.height
+    
+    def get_fee_estimates(self):
+        return {
+            priority: FeeEstimate(rate, int(rate * 110), priority)
+            for priority, rate in (('high', 10.0), ('medium', 5.0), ('low', 2.0), ('economy', 1.0))
+        }
+    
+    def get_address_balances(self, addresses):
+        return [self.balances.get(address, (0, 0)) for address in addresses]
+
+
+@pytest.fixture
+def api():
+    return StubAPI()
+
+
+@pytest.fixture
+def client(temp_db, api, monkeypatch):
+    """A test client for a fresh app; the relay engine is never started."""
+    from src import config
+    
+    # Importing the module creates its own app, so the secret must be set first
+    monkeypatch.setattr(config, 'SECRET_KEY', 'test-secret')
+    from src import app as app_module
+    
+    monkeypatch.setattr(app_module, 'SECRET_KEY', 'test-secret')
+    monkeypatch.setattr(app_module, 'get_bitcoin_api', lambda network: api)
+    # The chain list ETag also rolls over every CHAINS_ETAG_TTL seconds; keep it fixed within a test
+    monkeypatch.setattr(app_module, 'CHAINS_ETAG_TTL', 10 ** 9)
+    app = app_module.create_app()
+    app.engine_ready.set()
+    return app.test_client()
+
+
+class TestParseBody:
+    """Test POST body validation against the route schemas."""
+    
+    def test_not_an_object(self, client):
+        """Test a missing or non-object body is rejected."""
+        response = client.post('/api/fees/estimate')
+        assert response.status_code == 400
+        assert response.get_json() == {'error': 'Request body must be a JSON object'}
+        
+        response = client.post('/api/fees/estimate', json=[3])
+        assert response.status_code == 400
+    
+    def test_missing_field(self, client):
+        """Test missing fields take their defaults, and a missing required field is rejected by the route."""
+        response = client.post('/api/fees/estimate', json={})
+        assert response.status_code == 200
+        assert (response.get_json()['num_hops'], response.get_json()['fee_priority']) == (3, 'medium')
+        
+        response = client.post('/api/network', json={})
+        assert response.status_code == 400
+        assert response.get_json() == {'error': 'Invalid network'}
+    
+    def test_wrong_type(self, client):
+        """Test a field of the wrong type is rejected, including a boolean where a number is expected."""
+        for num_hops in ('3', 3.0, True):
+            response = client.post('/api/fees/estimate', json={'num_hops': num_hops})
+            assert response.status_code == 400
+            assert response.get_json() == {'error': "'num_hops' must be an integer"}
+        
+        response = client.post('/api/chains', json={'dry_run': 'yes'})
+        assert response.status_code == 400
+        assert response.get_json() == {'error': "'dry_run' must be a boolean"}
+    
+    def test_out_of_range(self, client):
+        """Test a well-typed hop count outside the allowed range is rejected."""
+        response = client.post('/api/fees/estimate', json={'num_hops': MAX_HOPS + 1})
+        assert response.status_code == 400
+        assert 'Hops must be between' in response.get_json()['error']
+        
+        response = client.post('/api/chains', json={'num_hops': 0})
+        assert response.status_code == 400
+    
+    def test_valid_body(self, client):
+        """Test a valid body reaches the route with its values."""
+        response = client.post('/api/fees/estimate', json={'num_hops': 5, 'fee_priority': 'high'})
+        assert response.status_code == 200
+        data = response.get_json()
+        assert (data['num_hops'], data['fee_priority']) == (5, 'high')
+        assert data['fees']['fee_per_transaction_sats'] == 1100
+
+
+class TestConditionalGet:
+    """Test ETag revalidation of the polled status and chain list routes."""
+    
+    @pytest.mark.parametrize('path', ['/api/status', '/api/chains'])
+    def test_matching_etag_not_modified(self, client, path):
+        """Test a poll with the current ETag gets an empty 304 carrying the same ETag."""
+        response = client.get(path)
+        assert response.status_code == 200
+        etag = response.headers['ETag']
+        
+        response = client.get(path, headers={'If-None-Match': etag})
+        assert response.status_code == 304
+        assert response.data == b''
+        assert response.headers['ETag'] == etag
+    
+    @pytest.mark.parametrize('path', ['/api/status', '/api/chains'])
+    def test_state_change_new_etag(self, client, api, path):
+        """Test a relay state change or a new tip answers the old ETag with a full 200 and a new ETag."""
+        from src.relay_engine import status_notifier
+        
+        etag = client.get(path).headers['ETag']
+        status_notifier.notify()
+        response = client.get(path, headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        assert response.headers['ETag'] != etag
+        
+        etag = response.headers['ETag']
+        api.height += 1
+        response = client.get(path, headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        assert response.headers['ETag'] != etag
+        assert response.get_json()['network'] == 'testnet'
+    
+    @pytest.mark.parametrize('path', ['/api/status', '/api/chains'])
+    def test_retry_new_etag(self, client, api, temp_db, monkeypatch, path):
+        """Test a manual retry invalidates the ETag polls were holding."""
+        from src import relay_engine
+        
+        monkeypatch.setattr(relay_engine, 'get_bitcoin_api', lambda network: api)
+        chain_id = temp_db.create_relay_chain("retry", "testnet", "intake", "enc", "final", False, None, 1)
+        temp_db.create_relay_hops_bulk(chain_id, [(0, "hop-0", "enc", 1)])
+        
+        etag = client.get(path).headers['ETag']
+        assert client.post(f'/api/chains/{chain_id}/retry').status_code == 200
+        response = client.get(path, headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        assert response.headers['ETag'] != etag
+
+
+class TestFixStatus:
+    """Test the statuses written by the fix-status route."""
+    
+    def make_chain(self, db):
+        chain_id = db.create_relay_chain("fix", "testnet", "intake", "enc", "final", False, None, 3)
+        db.create_relay_hops_bulk(chain_id, [(n, f"hop-{n}", "enc", 1) for n in range(3)])
+        db.update_chain_status(chain_id, 'active')
+        return chain_id
+    
+    def test_relayed_hop_fixed(self, client, api, temp_db):
+        """Test an empty hop whose next address holds funds is marked relayed and current_hop moves to the funds."""
+        chain_id = self.make_chain(temp_db)
+        api.balances['hop-2'] = (0, 5000)
+        
+        response = client.post(f'/api/chains/{chain_id}/fix-status')
+        assert response.get_json()['fixes'] == ["Fixed Hop 2: waiting -> relayed", "Fixed current hop: Hop 1 -> Hop 3"]
+        assert [hop['status'] for hop in temp_db.get_relay_hops(chain_id)] == ['waiting', 'relayed', 'waiting']
+        chain = temp_db.get_relay_chain(chain_id)
+        assert (chain['status'], chain['current_hop']) == ('active', 2)
+        
+        # A second run finds nothing left to fix
+        assert client.post(f'/api/chains/{chain_id}/fix-status').get_json()['fixes'] == []
+    
+    def test_completed_chain_fixed(self, client, api, temp_db):
+        """Test confirmed funds at the final address mark every hop relayed and the chain completed."""
+        chain_id = self.make_chain(temp_db)
+        api.balances['final'] = (9000, 0)
+        
+        response = client.post(f'/api/chains/{chain_id}/fix-status')
+        assert "Fixed chain status: active -> completed" in response.get_json()['fixes']
+        assert [hop['status'] for hop in temp_db.get_relay_hops(chain_id)] == ['relayed'] * 3
+        chain = temp_db.get_relay_chain(chain_id)
+        assert (chain['status'], chain['amount_sent_sats']) == ('completed', 9000)
+
@@ -8,15 +8,16 @@ import sys
 import tempfile
 from pathlib import Path
 
-# Add src to path
-sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+# Add project root to path (src uses package-relative imports)
+sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from config import FIBONACCI_DELAYS, MIN_HOPS, MAX_HOPS
-from encryption import KeyEncryption, generate_password_hash, verify_password_hash
-from bitcoin_utils import (
+from src.config import FIBONACCI_DELAYS, MIN_HOPS, MAX_HOPS, SALT_LENGTH
+from src.encryption import KeyEncryption, generate_password_hash, verify_password_hash
+from src.bitcoin_utils import (
     calculate_fibonacci_delays, 
     estimate_total_fees, 
     estimate_relay_timing,
+    BitcoinAPI,
     WalletManager,
     FeeEstimate
 )
@@ -72,9 +73,52 @@ class TestEncryption:
         # Due to random salt/nonce, these should be different
         assert encrypted1 != encrypted2
         
+        # Each ciphertext carries its own salt
+        import base64
+        assert base64.b64decode(encrypted1)[:SALT_LENGTH] != base64.b64decode(encrypted2)[:SALT_LENGTH]
+        
         # But both should decrypt to the same value
         assert KeyEncryption.decrypt(encrypted1, password) == secret
         assert KeyEncryption.decrypt(encrypted2, password) == secret
+    
+    def test_decrypt_many(self):
+        """Test batch decryption returns plaintexts in order."""
+        password = "testpassword123"
+        secrets = ["first", "second", "third"]
+        encrypted = [KeyEncryption.encrypt(secret, password) for secret in secrets]
+        
+        assert KeyEncryption.decrypt_many(encrypted, password) == secrets
+        
+        with pytest.raises(Exception):
+            KeyEncryption.decrypt_many(encrypted, "wrongpassword")
+    
+    def test_decrypt_per_key_salt(self):
+        """Test data encrypted with its own random salt still decrypts."""
+        import base64
+        from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+        
+        password = "testpassword123"
+        salt, nonce = os.urandom(SALT_LENGTH), os.urandom(12)
+        key = KeyEncryption.derive_key(password, salt)
+        ciphertext = AESGCM(key).encrypt(nonce, b"testsecret", None)
+        encrypted = base64.b64encode(salt + nonce + ciphertext).decode('utf-8')
+        
+        assert KeyEncryption.decrypt(encrypted, password) == "testsecret"
+    
+    def test_preload_for(self):
+        """Test preloading derives the key so the later decrypt is a cache hit."""
+        import base64
+        from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+        
+        password = "testpassword123"
+        salt, nonce = os.urandom(SALT_LENGTH), os.urandom(12)
+        ciphertext = AESGCM(KeyEncryption.derive_key(password, salt)).encrypt(nonce, b"testsecret", None)
+        encrypted = base64.b64encode(salt + nonce + ciphertext).decode('utf-8')
+        
+        KeyEncryption.preload_for([encrypted, encrypted], password)
+        hits = KeyEncryption.cipher.cache_info().hits
+        assert KeyEncryption.decrypt(encrypted, password) == "testsecret"
+        assert KeyEncryption.cipher.cache_info().hits == hits + 1
 
 
 class TestFibonacciDelays:
@@ -168,6 +212,162 @@ class TestWalletManager:
         # Invalid - testnet addresses on mainnet
         assert wallet.validate_address("tb1qw508d6qejxtdg4y5r3zarvary0c5xw7kxpjzsx") is False
         assert wallet.validate_address("mipcBbFg9gMiCh81Kj8tqqdgoZub1ZJRfn") is False
+    
+    def test_invalid_characters(self):
+        """Test addresses with characters outside the Base58/bech32 alphabets are rejected."""
+        wallet = WalletManager("testnet")
+        
+        # 'b' is not in the bech32 alphabet, '0' is not in Base58
+        assert wallet.validate_address("tb1qw508d6qejxtdg4y5r3zarvary0c5xw7kxpjzsb") is False
+        assert wallet.validate_address("mipcBbFg9gMiCh81Kj8tqqdgoZub1ZJRf0") is False
+        assert wallet.validate_address("") is False
+    
+    def test_key_from_wif_not_shared(self):
+        """Test each lookup builds its own key, so callers never share unspents state."""
+        wallet = WalletManager("testnet")
+        address, wif = wallet.generate_key_pair()
+        
+        key = wallet.get_key_from_wif(wif)
+        assert wallet.get_key_from_wif(wif) is not key
+        assert key.to_wif() == wif
+        assert wallet.get_address_from_wif(wif) == address
+
+
+class TestBitcoinAPICache:
+    """Test caching of short-lived upstream results."""
+    
+    def test_block_height_cached(self):
+        """Test the tip height is fetched once within its TTL."""
+        api = BitcoinAPI("testnet")
+        calls = []
+        api._get_text = lambda endpoint: calls.append(endpoint) or "100"
+        
+        assert api.get_block_height() == 100
+        assert api.get_block_height() == 100
+        assert calls == ["blocks/tip/height"]
+    
+    def test_fee_fallback_not_cached(self):
+        """Test a failed fee fetch falls back to defaults without caching them."""
+        api = BitcoinAPI("testnet")
+        rates = [None, 5]
+        
+        def fetch():
+            rate = rates.pop(0)
+            if rate is None:
+                raise IOError("upstream down")
+            return {"medium": FeeEstimate(rate, rate * 110, "medium")}
+        api._fetch_fee_estimates = fetch
+        
+        assert api.get_fee_estimates()["medium"].fee_rate_sat_vb == 10
+        assert api.get_fee_estimates()["medium"].fee_rate_sat_vb == 5
+        assert api.get_fee_estimates()["medium"].fee_rate_sat_vb == 5
+    
+    def test_inflight_fetch_interrupted(self):
+        """Test callers waiting on a fetch get its exception even if it is not an Exception."""
+        import threading
+        
+        class Interrupted(BaseException):
+            pass
+        
+        api = BitcoinAPI("testnet")
+        started, release = threading.Event(), threading.Event()
+        
+        def fetch():
+            started.set()
+            release.wait(5)
+            raise Interrupted()
+        
+        leader_errors, waiter_errors = [], []
+        
+        def call(errors, fetcher):
+            try:
+                api._cached("key", 60, fetcher)
+            except BaseException as e:
+                errors.append(e)
+        
+        leader = threading.Thread(target=call, args=(leader_errors, fetch))
+        leader.start()
+        started.wait(5)
+        waiter = threading.Thread(target=call, args=(waiter_errors, lambda: "unused"))
+        waiter.start()
+        release.set()
+        leader.join(5)
+        waiter.join(5)
+        
+        assert not waiter.is_alive()
+        assert isinstance(leader_errors[0], Interrupted)
+        assert isinstance(waiter_errors[0], Interrupted)
+        assert api._inflight == {}
+
+
+class TestBitcoinAPIUnspents:
+    """Test loading a key's unspents through the shared API."""
+    
+    def test_load_unspents(self):
+        """Test UTXOs become typed bit unspents with confirmations from the tip."""
+        wallet = WalletManager("testnet")
+        _, wif = wallet.generate_key_pair()
+        key = wallet.get_key_from_wif(wif)
+        utxos = {
+            key.address: [],
+            key.segwit_address: [
+                {"txid": "aa" * 32, "vout": 1, "value": 5000, "status": {"confirmed": True, "block_height": 95}},
+                {"txid": "bb" * 32, "vout": 0, "value": 700, "status": {"confirmed": False}},
+            ],
+        }
+        api = BitcoinAPI("testnet")
+        api._get = lambda endpoint: utxos[endpoint.split("/")[1]]
+        api._get_text = lambda endpoint: "100"
+        
+        assert api.load_unspents(key) == 5700
+        assert key.balance == 5700
+        assert [(u.txindex, u.confirmations, u.type) for u in key.unspents] == [(1, 6, "np2wkh"), (0, 0, "np2wkh")]
+
+
+class TestBroadcastRetry:
+    """Test which broadcast failures keep the signed transaction for a retry."""
+    
+    def test_retryable_broadcast_errors(self):
+        """Test transient failures are retryable and rejected transactions, fee floors included, are not."""
+        import requests
+        
+        def http_error(status, text):
+            response = requests.Response()
+            response.status_code = status
+            response._content = text.encode()
+            return requests.HTTPError(response=response)
+        
+        retryable = BitcoinAPI.is_retryable_broadcast_error
+        assert retryable(requests.ConnectionError()) is True
+        assert retryable(http_error(429, "Too Many Requests")) is True
+        assert retryable(http_error(503, "")) is True
+        assert retryable(http_error(400, 'sendrawtransaction RPC error: {"code":-26,"message":"mempool min fee not met"}')) is False
+        assert retryable(http_error(400, 'sendrawtransaction RPC error: {"code":-26,"message":"txn-mempool-conflict"}')) is False
+        assert retryable(ValueError("bad key")) is False
+    
+    def test_already_broadcast_errors(self):
+        """Test rejections for a transaction the node already has are recognized."""
+        import requests
+        
+        response = requests.Response()
+        response.status_code = 400
+        response._content = b'sendrawtransaction RPC error: {"code":-27,"message":"Transaction already in block chain"}'
+        
+        already = BitcoinAPI.is_already_broadcast_error
+        assert already(requests.HTTPError(response=response)) is True
+        assert BitcoinAPI.is_retryable_broadcast_error(requests.HTTPError(response=response)) is False
+        assert already(requests.ConnectionError()) is False
+    
+    def test_fee_floor_errors(self):
+        """Test fee floor rejections are recognized, so the transaction is rebuilt rather than replayed."""
+        import requests
+        
+        response = requests.Response()
+        response.status_code = 400
+        response._content = b'sendrawtransaction RPC error: {"code":-26,"message":"mempool min fee not met, 150 < 300"}'
+        
+        assert BitcoinAPI.is_fee_floor_error(requests.HTTPError(response=response)) is True
+        assert BitcoinAPI.is_fee_floor_error(requests.Timeout()) is False
 
 
 class TestConfiguration:
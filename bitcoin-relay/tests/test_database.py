@@ -0,0 +1,146 @@
+"""
+Unit tests for the SQLite storage layer, against a temp database.
+Run with: pytest tests/
+"""
+import pytest
+
+
+def make_chain(db, num_hops, network='testnet'):
+    """Insert a chain with placeholder keys and num_hops hops; returns (chain id, hop ids)."""
+    chain_id = db.create_relay_chain(
+        f"chain with {num_hops} hops", network, f"intake-{num_hops}", "enc", f"final-{num_hops}", False, None, num_hops
+    )
+    db.create_relay_hops_bulk(chain_id, [(n, f"hop-{chain_id}-{n}", "enc", 1) for n in range(num_hops)])
+    return chain_id, [hop['id'] for hop in db.get_relay_hops(chain_id)]
+
+
+class TestSettingsCache:
+    """Test the settings cache only holds committed values."""
+    
+    def test_set_setting_cached(self, temp_db):
+        """Test a committed setting is served from the cache."""
+        temp_db.set_setting('active_network', 'mainnet')
+        
+        assert temp_db._SETTINGS_CACHE['active_network'] == 'mainnet'
+        assert temp_db.get_setting('active_network') == 'mainnet'
+    
+    def test_set_setting_rolled_back(self, temp_db):
+        """Test a setting written in a transaction that rolls back never reaches the cache."""
+        temp_db.set_setting('active_network', 'testnet')
+        
+        with pytest.raises(RuntimeError):
+            with temp_db.db_transaction():
+                temp_db.set_setting('active_network', 'mainnet')
+                raise RuntimeError("abort")
+        
+        assert temp_db.get_setting('active_network') == 'testnet'
+        temp_db.invalidate_settings_cache()
+        assert temp_db.get_setting('active_network') == 'testnet'
+    
+    def test_set_setting_in_transaction(self, temp_db):
+        """Test a setting written inside a transaction is cached once it commits."""
+        with temp_db.db_transaction():
+            temp_db.set_setting('active_network', 'mainnet')
+            assert 'active_network' not in temp_db._SETTINGS_CACHE
+        
+        assert temp_db.get_setting('active_network') == 'mainnet'
+
+
+class TestBlockHeightCache:
+    """Test the block height cache only holds committed heights."""
+    
+    def test_update_block_height(self, temp_db):
+        """Test a committed height is served from the cache."""
+        temp_db.update_block_height('testnet', 100)
+        
+        assert temp_db.get_last_block_height('testnet') == 100
+        assert temp_db._BLOCK_HEIGHT_CACHE['testnet'] == (100, None)
+    
+    def test_update_block_height_rolled_back(self, temp_db):
+        """Test a height written in a transaction that rolls back never reaches the cache."""
+        temp_db.update_block_height('testnet', 100)
+        
+        with pytest.raises(RuntimeError):
+            with temp_db.db_transaction():
+                temp_db.update_block_height('testnet', 101)
+                raise RuntimeError("abort")
+        
+        assert temp_db.get_last_block_height('testnet') == 100
+        temp_db._BLOCK_HEIGHT_CACHE.clear()
+        assert temp_db.get_last_block_height('testnet') == 100
+
+
+class TestChainHopTotals:
+    """Test the fee and amount totals used when a chain completes."""
+    
+    def test_totals(self, temp_db):
+        """Test fees are summed over relayed hops and the amount comes from the last relayed hop."""
+        chain_id, hop_ids = make_chain(temp_db, 3)
+        assert temp_db.get_chain_hop_totals(chain_id) == (0, None)
+        
+        temp_db.update_hop_relayed(hop_ids[0], "tx1", 9000, 400)
+        temp_db.update_hop_relayed(hop_ids[1], "tx2", 8500, 500)
+        assert temp_db.get_chain_hop_totals(chain_id) == (900, 8500)
+        
+        # Another chain's hops don't count
+        _, other_hops = make_chain(temp_db, 2)
+        temp_db.update_hop_relayed(other_hops[1], "tx3", 100, 1000)
+        assert temp_db.get_chain_hop_totals(chain_id) == (900, 8500)
+
+
+
+class TestTransactionLogPage:
+    """Test paging through a chain's transaction log."""
+    
+    def test_pages_ordered(self, temp_db):
+        """Test pages follow (created_at, id) order, with id breaking ties within the same second."""
+        chain_id, _ = make_chain(temp_db, 2)
+        for n in range(5):
+            temp_db.log_transaction(chain_id=chain_id, event_type=f"event_{n}")
+        # An entry written later but stamped earlier sorts first
+        with temp_db.get_connection() as conn:
+            conn.execute(
+                "UPDATE transaction_log SET created_at = '2000-01-01 00:00:00' WHERE chain_id = ? AND event_type = 'event_4'",
+                (chain_id,)
+            )
+        
+        expected = ['event_4', 'event_0', 'event_1', 'event_2', 'event_3']
+        assert [entry['event_type'] for entry in temp_db.get_transaction_log(chain_id)] == expected
+        pages = [temp_db.get_transaction_log(chain_id, limit=2, offset=offset) for offset in (0, 2, 4, 6)]
+        assert [len(page) for page in pages] == [2, 2, 1, 0]
+        assert [entry['event_type'] for page in pages for entry in page] == expected
+
+
+class TestChainsWithHops:
+    """Test the chain listing with hops attached."""
+    
+    def test_hops_grouped_by_chain(self, temp_db):
+        """Test each chain gets exactly its own hops in hop order, filtered by network, without keys."""
+        first, first_hops = make_chain(temp_db, 3)
+        second, second_hops = make_chain(temp_db, 2)
+        other, other_hops = make_chain(temp_db, 4, network='mainnet')
+        empty, _ = make_chain(temp_db, 0)
+        expected = {first: first_hops, second: second_hops, other: other_hops, empty: []}
+        
+        chains = temp_db.get_all_relay_chains_with_hops('testnet')
+        assert sorted(chain['id'] for chain in chains) == sorted([first, second, empty])
+        for chain in chains:
+            assert [hop['id'] for hop in chain['hops']] == expected[chain['id']]
+            assert all(hop['chain_id'] == chain['id'] for hop in chain['hops'])
+            assert 'intake_privkey_encrypted' not in chain
+            assert all('privkey_encrypted' not in hop for hop in chain['hops'])
+        
+        chains = temp_db.get_all_relay_chains_with_hops()
+        assert {chain['id']: [hop['id'] for hop in chain['hops']] for chain in chains} == expected
+
+
+class TestHopStatus:
+    """Test bulk hop status updates."""
+    
+    def test_update_hops_status(self, temp_db):
+        """Test only the listed hops get the status, and an empty list is a no-op."""
+        chain_id, hop_ids = make_chain(temp_db, 3)
+        temp_db.update_hops_status([hop_ids[0], hop_ids[2]], 'relayed')
+        temp_db.update_hops_status([], 'failed')
+        assert [hop['status'] for hop in temp_db.get_relay_hops(chain_id)] == ['relayed', 'waiting', 'relayed']
+
@@ -0,0 +1,348 @@
+"""
+Unit tests for the relay engine, against a temp database and a stub network API.
+"""
+import pytest
+import requests
+
+from src.config import BROADCAST_MAX_ATTEMPTS, BROADCAST_RETRY_DELAYS
+from src.encryption import KeyEncryption
+from src.bitcoin_utils import BitcoinAPI, WalletManager, FeeEstimate
+from src.relay_engine import RelayEngine
+
+PASSWORD = "testpassword123"
+FEE_SATS = 500
+
+
+def http_error(status, text):
+    response = requests.Response()
+    response.status_code = status
+    response._content = text.encode()
+    return requests.HTTPError(response=response)
+
+
+class StubAPI:
+    """In-memory stand-in for BitcoinAPI: address balances, a tip, and scripted broadcast outcomes."""
+    
+    is_retryable_broadcast_error = staticmethod(BitcoinAPI.is_retryable_broadcast_error)
+    is_already_broadcast_error = staticmethod(BitcoinAPI.is_already_broadcast_error)
+    is_fee_floor_error = staticmethod(BitcoinAPI.is_fee_floor_error)
+    
+    def __init__(self, height=100):
+        self.height = height
+        self.fee_sats = FEE_SATS
+        self.balances = {}
+        self.broadcast_outcomes = []
+        self.broadcasts = []
+        self.balance_lookups = []
+    
+    def get_block_height(self):
+        return self.height
+    
+    def get_fee_estimates(self):
+        return {'medium': FeeEstimate(2.0, self.fee_sats, 'medium')}
+    
+    def get_address_balance(self, address):
+        return self.balances.get(address, (0, 0))
+    
+    def get_address_balances(self, addresses):
+        self.balance_lookups.append(list(addresses))
+        return [self.get_address_balance(address) for address in addresses]
+    
+    def load_unspents(self, key):
+        from bit.network.meta import Unspent
+        from bit.transaction import address_to_scriptpubkey
+        from bit.utils import bytes_to_hex
+        
+        amount = self.balances.get(key.segwit_address, (0, 0))[0]
+        script = bytes_to_hex(address_to_scriptpubkey(key.segwit_address))
+        key.unspents[:] = [Unspent(amount, 6, script, "ab" * 32, 0).set_type('np2wkh')] if amount else []
+        key.balance = amount
+        return amount
+    
+    def broadcast_transaction(self, tx_hex):
+        from bit.transaction import calc_txid
+        
+        self.broadcasts.append(tx_hex)
+        outcome = self.broadcast_outcomes.pop(0) if self.broadcast_outcomes else None
+        if outcome is not None:
+            raise outcome
+        return calc_txid(tx_hex)
+
+
+@pytest.fixture
+def relay_chain(temp_db):
+    """An active testnet chain with three hops; returns its id and addresses."""
+    wallet = WalletManager("testnet")
+    intake, final, *hops = (wallet.generate_key_pair() for _ in range(5))
+    chain_id = temp_db.create_relay_chain(
+        "test", "testnet", intake[0], KeyEncryption.encrypt(intake[1], PASSWORD),
+        final[0], False, None, len(hops)
+    )
+    temp_db.create_relay_hops_bulk(chain_id, [
+        (n, address, KeyEncryption.encrypt(wif, PASSWORD), 1) for n, (address, wif) in enumerate(hops, 1)
+    ])
+    temp_db.update_chain_status(chain_id, 'active')
+    return {'id': chain_id, 'intake': intake[0], 'hops': [address for address, _ in hops], 'final': final[0]}
+
+
+@pytest.fixture
+def engine():
+    """A testnet engine wired to a StubAPI."""
+    engine = RelayEngine("testnet", PASSWORD)
+    engine.api = StubAPI()
+    return engine
+
+
+def process(engine, temp_db, chain_id, block):
+    engine.api.height = block
+    engine._process_chain(temp_db.get_relay_chain(chain_id), block)
+
+
+def run_cycle(engine, block):
+    engine.api.height = block
+    return engine._process_cycle()
+
+
+class TestPendingBroadcast:
+    """Test the signed transaction kept across broadcast attempts."""
+    
+    def test_retry_rebroadcasts_same_transaction(self, temp_db, relay_chain, engine):
+        """Test a transient failure keeps the transaction and re-broadcasts it once the retry block comes."""
+        from bit.transaction import calc_txid
+        
+        chain_id = relay_chain['id']
+        engine.api.balances[relay_chain['intake']] = (10000, 0)
+        engine.api.broadcast_outcomes = [http_error(503, "Service Unavailable")]
+        
+        process(engine, temp_db, chain_id, 100)
+        retry_block = 100 + BROADCAST_RETRY_DELAYS[0]
+        pending = temp_db.get_pending_broadcasts([chain_id])[chain_id]
+        assert (pending['attempts'], pending['next_attempt_block']) == (1, retry_block)
+        assert engine._status_next[chain_id] == f"Broadcast retry at block {retry_block}"
+        
+        # Not retried before its block
+        process(engine, temp_db, chain_id, retry_block - 1)
+        assert len(engine.api.broadcasts) == 1
+        
+        process(engine, temp_db, chain_id, retry_block)
+        first, second = engine.api.broadcasts
+        assert second == first
+        assert temp_db.get_pending_broadcasts([chain_id]) == {}
+        hop = temp_db.get_relay_hops(chain_id)[0]
+        assert hop['incoming_txid'] == calc_txid(first)
+        assert hop['incoming_amount_sats'] == 10000 - FEE_SATS
+        events = [entry['event_type'] for entry in temp_db.get_transaction_log(chain_id)]
+        assert events == ['broadcast_retry', 'relay_sent']
+    
+    def test_rejected_transaction_dropped(self, temp_db, relay_chain, engine):
+        """Test a rejection that won't clear gives up on the transaction so the next attempt rebuilds it."""
+        chain_id = relay_chain['id']
+        engine.api.balances[relay_chain['intake']] = (10000, 0)
+        engine.api.broadcast_outcomes = [
+            http_error(400, 'sendrawtransaction RPC error: {"code":-26,"message":"txn-mempool-conflict"}')
+        ]
+        
+        process(engine, temp_db, chain_id, 100)
+        assert temp_db.get_pending_broadcasts([chain_id]) == {}
+        assert temp_db.get_relay_hops(chain_id)[0]['incoming_txid'] is None
+        assert [entry['event_type'] for entry in temp_db.get_transaction_log(chain_id)] == ['relay_error']
+        assert engine._sweep_failed is True
+    
+    def test_already_known_recorded(self, temp_db, relay_chain, engine):
+        """Test a retry the node already has is recorded as sent, with the txid of the stored transaction."""
+        from bit.transaction import calc_txid
+        
+        chain_id = relay_chain['id']
+        engine.api.balances[relay_chain['hops'][0]] = (8000, 0)
+        temp_db.update_chain_amounts(chain_id, current_hop=0)
+        engine.api.broadcast_outcomes = [
+            requests.Timeout(),
+            http_error(400, 'sendrawtransaction RPC error: {"code":-27,"message":"txn-already-in-mempool"}'),
+        ]
+        
+        process(engine, temp_db, chain_id, 100)
+        process(engine, temp_db, chain_id, 100 + BROADCAST_RETRY_DELAYS[0])
+        
+        tx_hex = engine.api.broadcasts[0]
+        hops = temp_db.get_relay_hops(chain_id)
+        assert hops[0]['outgoing_txid'] == calc_txid(tx_hex)
+        assert hops[1]['incoming_txid'] == calc_txid(tx_hex)
+        assert temp_db.get_relay_chain(chain_id)['current_hop'] == 1
+        assert temp_db.get_pending_broadcasts([chain_id]) == {}
+
+    
+    def test_fee_floor_rebuilds(self, temp_db, relay_chain, engine):
+        """Test fee floor rejections drop the signed transaction and rebuild it at the current fee each block."""
+        chain_id = relay_chain['id']
+        engine.api.balances[relay_chain['intake']] = (10000, 0)
+        min_fee = http_error(400, 'sendrawtransaction RPC error: {"code":-26,"message":"mempool min fee not met"}')
+        engine.api.broadcast_outcomes = [min_fee, min_fee]
+        
+        process(engine, temp_db, chain_id, 100)
+        assert temp_db.get_pending_broadcasts([chain_id]) == {}
+        assert engine._status_next[chain_id] == "Rebuilding transaction at block 101"
+        
+        engine.api.fee_sats = 800
+        process(engine, temp_db, chain_id, 101)
+        engine.api.fee_sats = 1200
+        process(engine, temp_db, chain_id, 102)
+        
+        assert len(set(engine.api.broadcasts)) == 3
+        assert temp_db.get_relay_hops(chain_id)[0]['incoming_amount_sats'] == 10000 - 1200
+        events = [entry['event_type'] for entry in temp_db.get_transaction_log(chain_id)]
+        assert events == ['broadcast_retry', 'broadcast_retry', 'relay_sent']
+    
+    def test_attempts_exhausted_rebuilds(self, temp_db, relay_chain, engine):
+        """Test a transaction that keeps failing is dropped after BROADCAST_MAX_ATTEMPTS and built again."""
+        chain_id = relay_chain['id']
+        engine.api.balances[relay_chain['intake']] = (10000, 0)
+        engine.api.broadcast_outcomes = [http_error(503, "Service Unavailable")] * BROADCAST_MAX_ATTEMPTS
+        
+        block = 100
+        for attempt in range(1, BROADCAST_MAX_ATTEMPTS):
+            process(engine, temp_db, chain_id, block)
+            pending = temp_db.get_pending_broadcasts([chain_id])[chain_id]
+            assert pending['attempts'] == attempt
+            block = pending['next_attempt_block']
+        
+        process(engine, temp_db, chain_id, block)
+        assert len(engine.api.broadcasts) == BROADCAST_MAX_ATTEMPTS
+        assert temp_db.get_pending_broadcasts([chain_id]) == {}
+        
+        engine.api.fee_sats = 900
+        process(engine, temp_db, chain_id, block + 1)
+        assert engine.api.broadcasts[-1] != engine.api.broadcasts[0]
+        assert temp_db.get_relay_hops(chain_id)[0]['incoming_amount_sats'] == 10000 - 900
+
+
+class TestManualRelay:
+    """Test manual relays and the chain lock they share with the engine."""
+    
+    def test_manual_relay_chain(self, temp_db, relay_chain, monkeypatch):
+        """Test a manual relay sends from the funded location and records it as a manual relay."""
+        from src import relay_engine
+        
+        api = StubAPI()
+        api.balances[relay_chain['intake']] = (10000, 0)
+        monkeypatch.setattr(relay_engine, 'get_bitcoin_api', lambda network: api)
+        
+        result = relay_engine.manual_relay_chain(relay_chain['id'], PASSWORD)
+        assert [step['status'] for step in result['results']] == ['success', 'no_funds', 'no_funds', 'no_funds']
+        assert result['results'][0]['amount'] == 10000 - FEE_SATS
+        events = [entry['event_type'] for entry in temp_db.get_transaction_log(relay_chain['id'])]
+        assert events == ['manual_relay']
+        assert not relay_engine.chain_lock(relay_chain['id']).locked()
+    
+    def test_engine_skips_locked_chain(self, temp_db, relay_chain, engine):
+        """Test the engine leaves a chain alone while a manual relay holds its lock, and retries the sweep."""
+        from src.relay_engine import chain_lock
+        
+        chain_id = relay_chain['id']
+        engine.api.balances[relay_chain['intake']] = (10000, 0)
+        
+        with chain_lock(chain_id):
+            process(engine, temp_db, chain_id, 100)
+        assert engine.api.broadcasts == []
+        assert engine._status_next[chain_id] == "Manual relay in progress"
+        assert engine._sweep_failed is True
+        
+        process(engine, temp_db, chain_id, 100)
+        assert len(engine.api.broadcasts) == 1
+
+
+class TestHopWindow:
+    """Test which hops a sweep checks for a chain's funds."""
+    
+    def test_funds_at_current_hop(self, temp_db, relay_chain, engine):
+        """Test funds at hops[current_hop] are relayed without looking up the hops before it."""
+        chain_id = relay_chain['id']
+        temp_db.update_chain_amounts(chain_id, current_hop=1)
+        engine.api.balances[relay_chain['hops'][1]] = (8000, 0)
+        engine._full_sweep = False
+        
+        process(engine, temp_db, chain_id, 100)
+        hops = relay_chain['hops']
+        assert engine.api.balance_lookups == [[relay_chain['intake'], hops[1], hops[2], relay_chain['final']]]
+        assert temp_db.get_relay_hops(chain_id)[1]['outgoing_txid'] is not None
+        assert temp_db.get_relay_chain(chain_id)['current_hop'] == 2
+    
+    def test_funds_at_next_hop(self, temp_db, relay_chain, engine):
+        """Test funds one hop past current_hop, from a relay that wasn't recorded, are still found."""
+        chain_id = relay_chain['id']
+        temp_db.update_chain_amounts(chain_id, current_hop=0)
+        engine.api.balances[relay_chain['hops'][1]] = (8000, 0)
+        engine._full_sweep = False
+        
+        process(engine, temp_db, chain_id, 100)
+        assert temp_db.get_relay_hops(chain_id)[1]['outgoing_txid'] is not None
+        assert temp_db.get_relay_chain(chain_id)['current_hop'] == 2
+    
+    def test_funds_outside_window_found_on_full_sweep(self, temp_db, relay_chain, engine):
+        """Test funds beyond the window are missed by a regular sweep and relayed by the next full one."""
+        from src.config import ENGINE_FULL_SWEEP_INTERVAL
+        
+        chain_id = relay_chain['id']
+        temp_db.update_chain_amounts(chain_id, current_hop=0)
+        engine.api.balances[relay_chain['hops'][2]] = (8000, 0)
+        
+        engine._sweep_count = 1
+        run_cycle(engine, 100)
+        assert relay_chain['hops'][2] not in engine.api.balance_lookups[0]
+        assert engine.api.broadcasts == []
+        
+        engine._sweep_count = ENGINE_FULL_SWEEP_INTERVAL
+        run_cycle(engine, 101)
+        assert relay_chain['hops'][2] in engine.api.balance_lookups[1]
+        assert temp_db.get_relay_hops(chain_id)[2]['outgoing_txid'] is not None
+        assert temp_db.get_relay_chain(chain_id)['status'] == 'completed'
+
+
+class TestSweepSkip:
+    """Test that cycles only sweep when the tip moves or the last sweep failed."""
+    
+    def test_unchanged_tip_skipped(self, temp_db, relay_chain, engine):
+        """Test a cycle on the tip that was already swept makes no balance lookups."""
+        assert run_cycle(engine, 100) is True
+        assert len(engine.api.balance_lookups) == 1
+        
+        assert run_cycle(engine, 100) is True
+        assert len(engine.api.balance_lookups) == 1
+        
+        run_cycle(engine, 101)
+        assert len(engine.api.balance_lookups) == 2
+        assert temp_db.get_last_block_height('testnet') == 101
+    
+    def test_failed_sweep_retried(self, temp_db, relay_chain, engine):
+        """Test a sweep with a failed relay is repeated on the same tip, and skipped once it succeeds."""
+        engine.api.balances[relay_chain['intake']] = (10000, 0)
+        engine.api.broadcast_outcomes = [
+            http_error(400, 'sendrawtransaction RPC error: {"code":-25,"message":"bad-txns-inputs-missingorspent"}')
+        ]
+        
+        run_cycle(engine, 100)
+        assert engine.processing_status[relay_chain['id']].startswith("Relay failed")
+        
+        run_cycle(engine, 100)
+        assert len(engine.api.broadcasts) == 2
+        assert temp_db.get_relay_hops(relay_chain['id'])[0]['incoming_txid'] is not None
+        
+        run_cycle(engine, 100)
+        assert len(engine.api.balance_lookups) == 2
+    
+    def test_notify_only_on_change(self, temp_db, relay_chain, engine):
+        """Test cycles wake status listeners only when the engine status changed."""
+        from src.relay_engine import status_notifier
+        
+        def cycle(block):
+            engine.api.height = block
+            version = status_notifier.version
+            engine._run_cycle()
+            return status_notifier.version != version
+        
+        assert cycle(100) is True
+        assert cycle(100) is False
+        assert cycle(101) is False
+        
+        engine.api.balances[relay_chain['intake']] = (10000, 0)
+        assert cycle(102) is True
+        assert engine.processing_status[relay_chain['id']].startswith("Sent: Intake -> Hop 1")
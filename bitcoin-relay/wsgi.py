@@ -0,0 +1,8 @@
+"""
+WSGI entry point for production servers, e.g.:
+
+    gunicorn wsgi:app -c gunicorn_conf.py
+"""
+from src.app import app
+
+__all__ = ['app']